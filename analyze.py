@@ -4,20 +4,59 @@ Chair of Algorithms and Data Structures.
 Author: Hannah Bast <bast@cs.uni-freiburg.de>
 """
 
+import os
+import re
 import sys
+import glob
+import json
 import math
+import time
+import atexit
+import bisect
+import pickle
 import random
+import hashlib
 import pathlib
+import cProfile
+import itertools
+import contextlib
+import collections
+import concurrent.futures
+import numpy as np
 
 # Some constants
 
 # Standard deviation of Gaussian noise for avr, l5r, l3r, l2r
-# A value of 0.8 gives the same Kendall tau as the real data
+# A value of 0.8 gives the same Kendall tau as the real data (for a new data
+# set, see --calibrate-noise; the value can be set with --noise-sd)
 score_noise_standard_deviation = 0.8
 
 # Number of accepted papers. In the experiment, 12 papers were accepted per PC.
 num_accepted = 12
 
+# Pattern of the names of the score files. The first * is the number of the
+# phase and the second * is the number of the PC. In the experiment, there
+# were three phases with two PCs each (see FORMAT.md).
+score_file_pattern = "scores-phase*-pc*.tsv"
+
+# The modes which can be part of a report (see EsaExperimentData.report), with
+# the default number of samples for those which draw random samples.
+report_modes = {
+    "--kendall": None,
+    "--overlap": None,
+    "--overlap-random-ties": None,
+    "--bootstrap": 10000,
+    "--decision-stability": 10000,
+    "--simulate": 10000,
+    "--calibrate-noise": 2000,
+    "--rtest-batch": 131072,
+    "--rtest-walk": 131072,
+    "--rtest-exact": 131072,
+    "--confusion-pcs": None,
+    "--confusion-phases": None,
+    "--confusion-phases-individual-scores": None
+}
+
 
 # Dictionary with long names for the score types above.
 score_type_names = {
@@ -70,6 +109,91 @@ score_labels_by_type = {
     "l2r":  ["+1", "-1"]
 }
 
+# Maps from l5 (or av5) scores to the reduced scores.
+l5_to_l3u_map = {+2: +2, +1: +1, +0: -1, -1: -1, -2: -1}
+l5_to_l3m_map = {+2: +1, +1: +1, +0: +0, -1: -1, -2: -1}
+l5_to_l3l_map = {+2: +1, +1: +1, +0: -1, -1: -1, -2: -2}
+l5_to_l2u_map = {+2: +2, +1: +0, +0: +0, -1: +0, -2: +0}
+l5_to_l2m_map = {+2: +1, +1: +1, +0: -1, -1: -1, -2: -1}
+l5_to_l2l_map = {+2: +0, +1: +0, +0: +0, -1: +0, -2: -2}
+
+
+def _reduction(score_map):
+    """
+    The function which maps a list of scores from {-2, ..., +2} with the
+    given score map, by a lookup table. Like the score map, it raises a
+    KeyError for any other score.
+
+    >>> _reduction(l5_to_l3m_map)([2, 1, 0, -1, -2])
+    [1, 1, 0, -1, -1]
+    >>> _reduction(l5_to_l3m_map)([2, -3])
+    Traceback (most recent call last):
+    ...
+    KeyError: -3
+    """
+
+    lookup_table = np.array([score_map[x] for x in range(-2, 3)])
+
+    def reduce(scores):
+        scores = np.asarray(scores)
+        with np.errstate(invalid="ignore"):
+            indices = scores.astype(int) + 2
+        is_valid = (indices == scores + 2) & (indices >= 0) & (indices < 5)
+        if not is_valid.all():
+            raise KeyError(scores[~is_valid][0].item())
+        return lookup_table[indices].tolist()
+
+    return reduce
+
+
+def _rounded(scores):
+    return np.round(scores).astype(int).tolist()
+
+
+def _threshold(scores, l5_scores):
+    return np.where(np.greater(l5_scores, 0), scores, 0.0).tolist()
+
+
+# How the score types are derived from each other: for each type which is not
+# computed directly (av and l5 from the score-confidence pairs, avr and rnd at
+# random, see compute_scores), the list of parent types and a function which
+# computes the list of scores from the lists of scores of the parents.
+score_derivations = {
+    "l3u":  (["l5"], _reduction(l5_to_l3u_map)),
+    "l3m":  (["l5"], _reduction(l5_to_l3m_map)),
+    "l3l":  (["l5"], _reduction(l5_to_l3l_map)),
+    "l2u":  (["l5"], _reduction(l5_to_l2u_map)),
+    "l2m":  (["l5"], _reduction(l5_to_l2m_map)),
+    "l2l":  (["l5"], _reduction(l5_to_l2l_map)),
+    "av5":  (["av"], _rounded),
+    "av3u": (["av5"], _reduction(l5_to_l3u_map)),
+    "av3m": (["av5"], _reduction(l5_to_l3m_map)),
+    "av3l": (["av5"], _reduction(l5_to_l3l_map)),
+    "av2u": (["av5"], _reduction(l5_to_l2u_map)),
+    "av2m": (["av5"], _reduction(l5_to_l2m_map)),
+    "av2l": (["av5"], _reduction(l5_to_l2l_map)),
+    "avt":  (["av", "l5"], _threshold),
+    "avrt": (["avr", "l5"], _threshold),
+    "l5r":  (["avr"], _rounded),
+    "l3r":  (["l5r"], _reduction(l5_to_l3m_map)),
+    "l2r":  (["l5r"], _reduction(l5_to_l2m_map))
+}
+
+
+def is_random_score_type(score_type):
+    """
+    Check whether the given score type depends on avr or rnd.
+
+    >>> is_random_score_type("l3r"), is_random_score_type("av3u")
+    (True, False)
+    """
+
+    if score_type in ["avr", "rnd"]:
+        return True
+    parents, _ = score_derivations.get(score_type, ([], None))
+    return any(map(is_random_score_type, parents))
+
+
 # Usage info printed when calling script without arguments.
 usage_info = """
 Usage: python3 analyze.py <score type> [options]
@@ -77,10 +201,58 @@ Usage: python3 analyze.py <score type> [options]
 Analyze the similarity of the rankings produced by the two PCs. Options are:
 
 --print: print scores for each PC and create gnuplot script (just try it)
+--overlap: print overlap of top k papers for each k and create gnuplot script
+--overlap-random-ties: like --overlap, but expected overlap if ties are random
+--bootstrap: like --kendall, with bootstrap intervals, and the overlap of the
+  top 12 papers (10000 resamples of the papers by default)
+--decision-stability: probability that the decision for a paper flips when
+  its reviews are resampled (10000 resamples by default)
+--simulate: distribution of overlap and Kendall tau for simulated conferences,
+  with score type avr, l5r or rnd (10000 conferences by default)
+--calibrate-noise: find the noise for avr (for av), l5r, l3r, l2r (for l5, l3m,
+  l2m), for which simulated scores have the same Kendall tau as the real ones
+--rtest: compute p-values of an R-test between the phases (2048 samples)
+--rtest-batch: like --rtest, but vectorized with NumPy and 131072 samples
+--rtest-walk: like --rtest, but with incremental updates along a random walk
+--rtest-exact: exact R-test if few papers differ, otherwise like --rtest-walk
 --confusion-pcs: show confusion matrix between PCs for each phase
 --confusion-phases: show confusion matrix between phases for each PC
 --confusion-phases-individual-scores: like previous, but per review not per paper
 
+Options for the modes with random samples (the --rtest* modes, --bootstrap,
+--decision-stability, --simulate, and --calibrate-noise; the seed is also used
+for the random score types):
+
+--samples=<n>: use n samples instead of the default
+--seed=<s>: seed for the random generator, for reproducible results
+--workers=<w>: distribute samples (and the comparisons of --kendall) over w
+  processes (0 = all cores)
+--stop-early=<alpha>: stop when the p-value is clearly above or below alpha
+--noise-sd=<sigma>: standard deviation of the noise for avr, l5r, l3r, l2r
+--papers=<n>: number of papers per simulated conference (default: as in data)
+--accepted=<k>: number of accepted papers per PC for --simulate (default: 12)
+
+The score files are scores-phase<n>-pc<i>.tsv, for all phases n and PCs i
+found (see FORMAT.md). Use --files=<pattern> for other files, where the first
+* in the pattern is the phase and the second * is the PC.
+
+With --report=<file>, the results of the given modes (default: all modes
+except --print and --rtest) for the given score types (default: all types) are
+computed at once and written to the file as JSON, instead of printing them.
+
+The parsed score files are cached in the sub-directory "tmp/cache", so that
+they are only parsed again when their contents change. The results of
+--kendall, --overlap*, --rtest* (with --seed), --confusion-*, and --report
+are cached in "tmp/cache/results" (the least recently used ones are removed
+when they take more than 64 MB), so that they are only computed again when
+the score files or the options change. Use --no-cache to use neither cache.
+
+With --profile, the wall time and number of calls of each stage (parsing,
+each score type, each Kendall tau variant, the overlaps, the confusion
+matrices, the R-test samples, ...) and counters of the work done are printed
+at the end. With --profile=<file>, additionally a cProfile of the whole run is
+written to the file (view it with python3 -m pstats <file>).
+
 The <score type> specifies which score is used for each submission and PC. If
 multiple score types are specified, the analysis is done for each score type,
 one after the other.
@@ -120,16 +292,695 @@ below if the associated confidence is >= 3
 """
 
 
+class ScoreFileError(ValueError):
+    """
+    Raised when reading a score file with malformed rows. The message lists
+    all of them, one per line, in the format <file name>:<line number>:
+    <problem>.
+    """
+
+
+class ScoreTable:
+    """
+    Columnar store for the score-confidence pairs from one score file, that
+    is, for one PC and one phase. Row k contains the entries of paper k, first
+    the reviews and then, if there is one, the vote (see FORMAT.md), padded
+    to max_entries columns with score 0 and confidence 0:
+
+    scores: float array of shape (n, max_entries)
+    confidences: int8 array of shape (n, max_entries)
+    num_reviews: int8 array with the number of reviews of each paper
+    has_vote: bool array, which says whether a paper has a vote entry
+
+    The scores are float64 and not float32, because the vote scores (like
+    +0.1290) are not exactly representable as float32, and all computed
+    scores should be exactly the same as before.
+
+    For compatibility with code that works on a list of lists of
+    score-confidence pairs (like compute_scores), a ScoreTable also behaves
+    like such a list, with Python floats and ints.
+
+    >>> table = ScoreTable.from_pairs([[(1.0, 4), (-1.0, 3), (0.0, 3)],
+    ...                                [(2.0, 2), (1.0, 5), (0.0, 3),
+    ...                                 (0.7, 5)]], [False, True])
+    >>> table.num_reviews.tolist(), table.has_vote.tolist()
+    ([3, 3], [False, True])
+    >>> table.confidences.tolist()
+    [[4, 3, 3, 0, 0], [2, 5, 3, 5, 0]]
+    >>> len(table)
+    2
+    >>> table[1]
+    [(2.0, 2), (1.0, 5), (0.0, 3), (0.7, 5)]
+    >>> list(table) == [table[0], table[1]]
+    True
+    """
+
+    max_entries = 5
+
+    # Layout of one row in the binary format (see to_records). Increase the
+    # version when changing the layout or the parsing, so that files in a
+    # cache written by an older version are not used anymore.
+    record_dtype = np.dtype([("scores", np.float64, (max_entries,)),
+                             ("confidences", np.int8, (max_entries,)),
+                             ("num_reviews", np.int8),
+                             ("has_vote", bool)])
+    record_format_version = 1
+
+    def __init__(self, scores, confidences, num_reviews, has_vote):
+        self.scores = scores
+        self.confidences = confidences
+        self.num_reviews = num_reviews
+        self.has_vote = has_vote
+
+    @classmethod
+    def from_pairs(cls, score_confidence_pairs, has_vote=None):
+        """
+        Build a ScoreTable from a list of lists of score-confidence pairs.
+        If has_vote is not given, all entries are considered to be reviews.
+        """
+
+        n = len(score_confidence_pairs)
+        scores = np.zeros((n, cls.max_entries))
+        confidences = np.zeros((n, cls.max_entries), dtype=np.int8)
+        num_entries = np.zeros(n, dtype=np.int8)
+        for k, pairs in enumerate(score_confidence_pairs):
+            if len(pairs) > cls.max_entries:
+                raise ValueError("Paper %d has %d score-confidence pairs, the "
+                                 "maximum is %d" % (k, len(pairs),
+                                                    cls.max_entries))
+            for i, (score, confidence) in enumerate(pairs):
+                scores[k, i] = score
+                confidences[k, i] = confidence
+            num_entries[k] = len(pairs)
+        has_vote = np.zeros(n, dtype=bool) if has_vote is None \
+            else np.array(has_vote, dtype=bool)
+        return cls(scores, confidences, num_entries - has_vote, has_vote)
+
+    @classmethod
+    def from_lines(cls, lines, file_name="<input>", first_line_number=1):
+        """
+        Build a ScoreTable from the lines of a score file (see FORMAT.md),
+        where the first line has the given line number in the given file.
+        Each line has eight columns (three or four reviews, an empty fourth
+        review is written as __ _) or ten columns (with the vote as score and
+        confidence in columns 9 and 10).
+
+        All lines are parsed at once (see from_text) and checked with NumPy.
+        If there are malformed rows, a ScoreFileError which lists all of them
+        is raised.
+
+        >>> table = ScoreTable.from_lines(["+1 4 -1 3 +0 3 __ _",
+        ...                                "+3 2 -2 5 +0 3 __ _ +0.5 5"])
+        >>> table[1]
+        [(3.0, 2), (-2.0, 5), (0.0, 3), (0.5, 5)]
+        >>> table.has_vote.tolist()
+        [False, True]
+        >>> try:
+        ...     ScoreTable.from_lines(["+1 4 -1 3 __ _ __ _",
+        ...                            "+1 4 -1 3 +0 3 -1",
+        ...                            "+1 4 -1 x +0 3 __ 2",
+        ...                            "+1 4 -1 3 +0 3 +1 4"], "x.tsv", 10)
+        ... except ScoreFileError as e:
+        ...     print(e)
+        3 malformed rows in x.tsv:
+        x.tsv:10: column 5 is empty
+        x.tsv:10: column 6 is empty
+        x.tsv:11: expected 8 or 10 columns, found 7
+        x.tsv:12: column 4 is not a confidence from 1..5: "x"
+        x.tsv:12: columns 7 and 8 must both be empty or both be non-empty
+        """
+
+        return cls.from_text("".join(line + "\n" for line in lines).encode(),
+                             file_name, first_line_number)
+
+    @classmethod
+    def from_text(cls, text, file_name="<input>", first_line_number=1):
+        """
+        Like from_lines, but for the contents of a score file as bytes. The
+        tokens are located by a NumPy scan over the bytes and converted to
+        floats with a single call, so that no Python string is created for
+        each token (only for the tokens of malformed rows, if any).
+
+        >>> ScoreTable.from_text(b"+1 4 -1 3 +0 3 __ _\\r\\n")[0]
+        [(1.0, 4), (-1.0, 3), (0.0, 3)]
+        """
+
+        data = np.frombuffer(text, dtype=np.uint8)
+        is_space = np.isin(data, np.frombuffer(b" \t\n\r\x0b\x0c", np.uint8))
+        is_start = ~is_space
+        is_start[1:] &= is_space[:-1]
+        is_end = ~is_space
+        is_end[:-1] &= is_space[1:]
+        starts = np.flatnonzero(is_start)
+        ends = np.flatnonzero(is_end) + 1
+        newlines = np.flatnonzero(data == ord("\n"))
+        num_lines = len(newlines) + int(len(data) > 0 and
+                                        data[-1] != ord("\n"))
+        line_of_token = np.searchsorted(newlines, starts)
+        num_columns = np.bincount(line_of_token, minlength=num_lines)
+        has_valid_length = (num_columns == 8) | (num_columns == 10)
+
+        # An empty entry is written as __ (score) and _ (confidence). These
+        # tokens are overwritten by 0, so that all tokens can be converted.
+        lengths = ends - starts
+        second = data[np.minimum(starts + 1, len(data) - 1)]
+        is_placeholder = (data[starts] == ord("_")) & (
+            (lengths == 1) | (lengths == 2) & (second == ord("_")))
+        buffer = data.copy()
+        buffer[starts[is_placeholder]] = ord("0")
+        buffer[starts[is_placeholder & (lengths == 2)] + 1] = ord(" ")
+        try:
+            values = np.fromstring(buffer.tobytes().decode(), sep=" ")
+            if len(values) != len(starts):
+                raise ValueError("Not all tokens are numbers")
+            is_invalid = np.zeros(len(starts), dtype=bool)
+        except ValueError:
+            values, is_invalid = _tokens_to_floats(
+                np.array(buffer.tobytes().split(), dtype=bytes))
+
+        # Arrange the tokens in a table with ten columns. Missing columns (the
+        # vote in lines with eight columns) are empty.
+        first_token = np.cumsum(num_columns) - num_columns
+        column = np.arange(10)
+        token_index = np.where(column < num_columns[:, None],
+                               first_token[:, None] + column, len(starts))
+        is_empty = np.append(is_placeholder, True)[token_index]
+        values = np.append(values, 0.0)[token_index]
+        is_invalid = np.append(is_invalid, False)[token_index]
+
+        def token_text(k, i):
+            t = token_index[k, i]
+            return text[starts[t]:ends[t]].decode(errors="replace")
+
+        score_is_empty = is_empty[:, 0::2]
+        confidence_is_empty = is_empty[:, 1::2]
+        scores = np.ascontiguousarray(values[:, 0::2])
+        confidences = values[:, 1::2]
+        score_is_invalid = is_invalid[:, 0::2] | (
+            ~score_is_empty & ~np.isfinite(scores))
+        confidence_is_invalid = is_invalid[:, 1::2] | ~confidence_is_empty & (
+            (confidences != np.round(confidences)) |
+            (confidences < 1) | (confidences > 5))
+
+        # Collect all problems, row by row, but only for the rows which have
+        # problems at all. The first three reviews are mandatory.
+        is_mandatory = np.arange(5) < 3
+        is_half_empty = score_is_empty != confidence_is_empty
+        has_problem = ~has_valid_length | (
+            (score_is_empty | confidence_is_empty) & is_mandatory |
+            is_half_empty | score_is_invalid | confidence_is_invalid
+        ).any(axis=1)
+        errors = []
+        for k in np.flatnonzero(has_problem).tolist():
+            location = "%s:%d: " % (file_name, first_line_number + k)
+            if not has_valid_length[k]:
+                errors.append(location + "expected 8 or 10 columns, found %d"
+                              % num_columns[k])
+                continue
+            for i in range(5):
+                for is_empty, is_invalid, column, what in [
+                        (score_is_empty, score_is_invalid, 2 * i + 1,
+                         "score"),
+                        (confidence_is_empty, confidence_is_invalid,
+                         2 * i + 2, "confidence from 1..5")]:
+                    if is_empty[k, i] and is_mandatory[i]:
+                        errors.append(location + "column %d is empty"
+                                      % column)
+                    elif is_invalid[k, i]:
+                        token = token_text(k, column - 1)
+                        errors.append(location + "column %d is not a %s: "
+                                      "\"%s\"" % (column, what, token))
+                if is_half_empty[k, i] and not is_mandatory[i]:
+                    errors.append(location + "columns %d and %d must both "
+                                  "be empty or both be non-empty"
+                                  % (2 * i + 1, 2 * i + 2))
+        if errors:
+            raise ScoreFileError("%d malformed rows in %s:\n%s"
+                                 % (np.count_nonzero(has_problem), file_name,
+                                    "\n".join(errors)))
+
+        # Move the vote to the fourth column, if there are only three reviews.
+        is_present = ~score_is_empty
+        confidences = confidences.astype(np.int8)
+        confidences[~is_present] = 0
+        scores[~is_present] = 0
+        move_vote = ~is_present[:, 3] & is_present[:, 4]
+        scores[move_vote, 3] = scores[move_vote, 4]
+        confidences[move_vote, 3] = confidences[move_vote, 4]
+        scores[move_vote, 4] = 0
+        confidences[move_vote, 4] = 0
+        return cls(scores, confidences,
+                   (3 + is_present[:, 3]).astype(np.int8), is_present[:, 4])
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build a ScoreTable from a structured array like that returned by
+        to_records. The columns of the table are views of the array, so if it
+        is memory-mapped (np.load with mmap_mode), nothing is copied.
+
+        >>> table = ScoreTable.from_pairs([[(1.0, 4), (-1.0, 3), (0.5, 3)]])
+        >>> ScoreTable.from_records(table.to_records())[0]
+        [(1.0, 4), (-1.0, 3), (0.5, 3)]
+        """
+
+        if records.dtype != cls.record_dtype:
+            raise ValueError("Records have dtype %s, expected %s"
+                             % (records.dtype, cls.record_dtype))
+        return cls(records["scores"], records["confidences"],
+                   records["num_reviews"], records["has_vote"])
+
+    def to_records(self):
+        """
+        The table as a structured array with one row per paper, see
+        record_dtype. This is what is stored by np.save in the score cache.
+        """
+
+        records = np.empty(len(self), dtype=self.record_dtype)
+        records["scores"] = self.scores
+        records["confidences"] = self.confidences
+        records["num_reviews"] = self.num_reviews
+        records["has_vote"] = self.has_vote
+        return records
+
+    def resample_reviews(self, num_samples, rng):
+        """
+        Draw num_samples resamples of the reviews of each paper, with
+        replacement and each review with its confidence, from the given
+        np.random.Generator. Each paper keeps its number of reviews and its
+        vote. Returns a ScoreTable with num_samples * n rows, where row
+        s * n + k is resample s of paper k.
+
+        >>> table = ScoreTable.from_pairs([[(1, 4), (-1, 3), (0, 3)],
+        ...                                [(2, 2), (2, 2), (2, 2), (1, 5)]],
+        ...                               [False, True])
+        >>> resampled = table.resample_reviews(100, np.random.default_rng(1))
+        >>> len(resampled), resampled.num_reviews[:2].tolist()
+        (200, [3, 3])
+        >>> sorted(set(resampled[0] + resampled[2]))
+        [(-1.0, 3), (0.0, 3), (1.0, 4)]
+        >>> resampled[3]
+        [(2.0, 2), (2.0, 2), (2.0, 2), (1.0, 5)]
+        """
+
+        n = len(self)
+        columns = np.arange(self.max_entries)
+        is_review = columns < self.num_reviews[:, None]
+        drawn = (rng.random((num_samples, n, self.max_entries)) *
+                 self.num_reviews[:, None]).astype(np.int64)
+        source_columns = np.where(is_review, drawn, columns).reshape(
+            num_samples * n, self.max_entries)
+        rows = np.tile(np.arange(n), num_samples)[:, None]
+        return ScoreTable(self.scores[rows, source_columns],
+                          self.confidences[rows, source_columns],
+                          np.tile(self.num_reviews, num_samples),
+                          np.tile(self.has_vote, num_samples))
+
+    def num_entries(self):
+        """
+        The number of score-confidence pairs of each paper.
+        """
+
+        return self.num_reviews + self.has_vote
+
+    def entry_mask(self):
+        """
+        Boolean array of the same shape as scores, which is True exactly for
+        the non-padding entries.
+
+        >>> ScoreTable.from_pairs([[(1, 4)], [(1, 4), (2, 3)]]).entry_mask()
+        ... # doctest: +NORMALIZE_WHITESPACE
+        array([[ True, False, False, False, False],
+               [ True,  True, False, False, False]])
+        """
+
+        return np.arange(self.max_entries) < self.num_entries()[:, None]
+
+    def average_scores(self):
+        """
+        The confidence-weighted average score of each paper, like
+        EsaExperimentData.average_score, but for all papers at once. The
+        products are added column by column, in the same order as there, so
+        the results are exactly the same.
+
+        >>> ScoreTable.from_pairs([[(+1, 4), (-1, 3), (+0, 3)],
+        ...                        [(+0, 4), (-1, 2), (+0, 2), (-1, 4)],
+        ...                        [(+2, 4), (+0, 2), (+1, 2)]]
+        ...                       ).average_scores().tolist()
+        [0.1, -0.5, 1.25]
+        """
+
+        mask = self.entry_mask()
+        weights = np.where(mask, self.confidences, 0)
+        weighted_sum = self.scores[:, 0] * weights[:, 0]
+        for i in range(1, self.max_entries):
+            weighted_sum += self.scores[:, i] * weights[:, i]
+        return weighted_sum / weights.sum(axis=1)
+
+    def l5_scores(self):
+        """
+        The l5 score of each paper, like EsaExperimentData.l5_score, but for
+        all papers at once. The padding entries are masked out.
+
+        >>> ScoreTable.from_pairs([[(+2, 3), (+2, 4), (+2, 5)],
+        ...                        [(+2, 3), (+2, 4), (+2, 2)],
+        ...                        [(+1, 2), (+0, 4), (+1, 4)],
+        ...                        [(+0, 3), (-1, 4), (-2, 2)],
+        ...                        [(+0, 3), (-1, 4), (-2, 3), (+1, 1)],
+        ...                        [(-2, 3), (+0, 4), (+0, 3), (-1, 5)]]
+        ...                       ).l5_scores().tolist()
+        [2, 1, 0, -1, 0, -2]
+        """
+
+        mask = self.entry_mask()
+        is_demoted = (np.abs(self.scores) == 2) & (self.confidences < 3)
+        scores_m = np.where(is_demoted, np.clip(self.scores, -1, 1),
+                            self.scores)
+        all_two = np.all((scores_m == 2) | ~mask, axis=1)
+        max_score = np.where(mask, scores_m, -np.inf).max(axis=1)
+        min_score = np.where(mask, scores_m, np.inf).min(axis=1)
+        return np.select([all_two, max_score == 2, max_score == 1,
+                          min_score > -2], [2, 1, 0, -1], -2)
+
+    def __len__(self):
+        return len(self.num_reviews)
+
+    def __getitem__(self, k):
+        num_entries = int(self.num_reviews[k] + self.has_vote[k])
+        return list(zip(self.scores[k, :num_entries].tolist(),
+                        self.confidences[k, :num_entries].tolist()))
+
+    def __iter__(self):
+        scores = self.scores.tolist()
+        confidences = self.confidences.tolist()
+        for k, num_entries in enumerate(self.num_entries().tolist()):
+            yield list(zip(scores[k][:num_entries],
+                           confidences[k][:num_entries]))
+
+
+def _tokens_to_floats(tokens):
+    """
+    Convert an array of strings to floats, all at once if possible. Returns
+    the array of floats and a boolean array, which marks the strings which are
+    not numbers (the corresponding floats are nan).
+
+    >>> values, is_invalid = _tokens_to_floats(np.array(["+2", "x", "-0.5"]))
+    >>> values.tolist(), is_invalid.tolist()
+    ([2.0, nan, -0.5], [False, True, False])
+    """
+
+    try:
+        return tokens.astype(float), np.zeros(tokens.shape, dtype=bool)
+    except ValueError:
+        values = np.empty(tokens.shape)
+        is_invalid = np.zeros(tokens.shape, dtype=bool)
+        for index, token in np.ndenumerate(tokens):
+            try:
+                values[index] = float(token)
+            except ValueError:
+                values[index] = np.nan
+                is_invalid[index] = True
+        return values, is_invalid
+
+
+class ScoreStatistics:
+    """
+    Statistics of two lists of scores for the same papers (for example, for
+    the two PCs after one phase), which can be accumulated in chunks: the
+    number of papers, the sum and the sum of squares of each list, and, if
+    score labels are given, the confusion matrix between the two lists (see
+    confusion_matrices).
+
+    >>> stats = ScoreStatistics(["+1", "+0", "-1"])
+    >>> stats.add([+1, +1, +0], [-1, +1, +0])
+    >>> stats.add([-1], [-1])
+    >>> stats.num_papers, stats.means()
+    (4, [0.25, -0.25])
+    >>> ["%.3f" % x for x in stats.standard_deviations()]
+    ['0.829', '0.829']
+    >>> stats.confusion_matrix.tolist()
+    [[1, 0, 1], [0, 1, 0], [0, 0, 1]]
+    """
+
+    def __init__(self, score_labels=None):
+        self.num_papers = 0
+        self.sums = [0.0, 0.0]
+        self.sums_of_squares = [0.0, 0.0]
+        self.score_labels = score_labels
+        self.confusion_matrix = None
+        if score_labels is not None:
+            self.confusion_matrix = np.zeros(
+                (len(score_labels), len(score_labels)), dtype=np.int64)
+
+    def add(self, scores1, scores2):
+        """
+        Add the scores of some more papers.
+        """
+
+        assert len(scores1) == len(scores2)
+        self.num_papers += len(scores1)
+        for i, scores in enumerate([scores1, scores2]):
+            self.sums[i] += math.fsum(scores)
+            self.sums_of_squares[i] += math.fsum(x * x for x in scores)
+        if self.confusion_matrix is not None:
+            self.confusion_matrix += confusion_matrices(
+                [(scores1, scores2)], self.score_labels)[0]
+
+    def means(self):
+        return [total / self.num_papers for total in self.sums]
+
+    def standard_deviations(self):
+        return [math.sqrt(max(0.0, squares / self.num_papers - mean * mean))
+                for squares, mean in zip(self.sums_of_squares, self.means())]
+
+
+class Profiler:
+    """
+    The wall time and the number of calls of each stage of an analysis (for
+    example, parsing a score file or computing the scores of one type), and
+    counters for the work done (for example, the number of pairs of papers
+    compared). The time of a stage includes that of the stages nested in it
+    (for example, that of l5 in that of l3u). See NullProfiler for the
+    profiler used when profiling is off.
+
+    >>> profiler = Profiler()
+    >>> for _ in range(2):
+    ...     with profiler.stage("parse"):
+    ...         profiler.count("lines parsed", 3)
+    >>> profiler.stages["parse"][0], profiler.counters["lines parsed"]
+    (2, 6)
+    >>> ee = EsaExperimentData()
+    >>> ee.profiler = profiler
+    >>> ee.all_scores = [[[[(+2, 3), (+1, 2)]], [[(-1, 4), (-2, 5)]]]]
+    >>> _ = ee.compute_all_scores("l3u"), ee.compute_all_scores("l5")
+    >>> profiler.stages["score l5"][0], profiler.stages["score l3u"][0]
+    (2, 2)
+    >>> profiler.counters["score cache hits"]
+    2
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = collections.Counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Context manager which adds the time spent in it to the given stage.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stage = self.stages.setdefault(name, [0, 0.0])
+            stage[0] += 1
+            stage[1] += time.perf_counter() - start
+
+    def count(self, name, n=1):
+        """
+        Add n to the given counter.
+        """
+
+        self.counters[name] += n
+
+    def print_summary(self, file=sys.stdout):
+        """
+        Print the stages (in the order in which they were first entered) and
+        the counters.
+        """
+
+        print(file=file)
+        print("Profile (wall time and number of calls for each stage):",
+              file=file)
+        print(file=file)
+        for name, (num_calls, seconds) in self.stages.items():
+            print("%-32s %10.4f s %8d call%s" % (
+                name, seconds, num_calls, "" if num_calls == 1 else "s"),
+                file=file)
+        if self.counters:
+            print(file=file)
+            for name, value in self.counters.items():
+                print("%-32s %12d" % (name, value), file=file)
+
+
+class NullProfiler:
+    """
+    A profiler with the interface of Profiler which does nothing, so that
+    the hooks in EsaExperimentData cost (almost) nothing when profiling is
+    off.
+    """
+
+    stages = {}
+    counters = {}
+
+    def stage(self, name):
+        return _null_context
+
+    def count(self, name, n=1):
+        pass
+
+
+_null_context = contextlib.nullcontext()
+null_profiler = NullProfiler()
+
+
+class ResultCache:
+    """
+    A persistent cache for the results of the analyses, with one file in
+    the given directory for each result, named by a hash of its key (which
+    can be anything that can be written as JSON) and result_format_version.
+    When the files take more than max_bytes in total, the least recently
+    used ones are removed.
+
+    >>> cache = ResultCache("tmp/test-results", max_bytes=100)
+    >>> cache.clear()
+    >>> cache.get_or_compute(["kendall", 1], lambda: [0.5] * 3)
+    [0.5, 0.5, 0.5]
+    >>> cache.get_or_compute(["kendall", 1], lambda: None)
+    [0.5, 0.5, 0.5]
+    >>> cache.result_format_version += 1
+    >>> cache.get_or_compute(["kendall", 1], lambda: "new version")
+    'new version'
+    >>> _ = cache.get_or_compute(["kendall", 2], lambda: "x" * 100)
+    >>> cache.get_or_compute(["kendall", 1], lambda: "computed again")
+    'computed again'
+    """
+
+    # Increase the version when changing the computation or the format of
+    # any cached result (see EsaExperimentData.cached_result), so that
+    # results cached by an older version are not used anymore.
+    result_format_version = 2
+
+    def __init__(self, directory, max_bytes=64 * 2 ** 20,
+                 profiler=null_profiler):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.profiler = profiler
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the result for the given key from the cache, or compute it
+        with compute() and add it to the cache.
+        """
+
+        try:
+            return self.get(key)
+        except KeyError:
+            pass
+        result = compute()
+        self.put(key, result)
+        return result
+
+    def get(self, key):
+        """
+        Return the result for the given key from the cache. Raises a KeyError
+        if it is not in the cache.
+        """
+
+        file_name = self._file_name(key)
+        try:
+            with open(file_name, "rb") as f:
+                result = pickle.load(f)
+            os.utime(file_name)
+            self.profiler.count("result cache hits")
+            return result
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.profiler.count("result cache misses")
+            raise KeyError(key) from None
+
+    def put(self, key, result):
+        """
+        Add the result for the given key to the cache.
+        """
+
+        file_name = self._file_name(key)
+        pathlib.Path(self.directory).mkdir(parents=True, exist_ok=True)
+        temp_file_name = "%s.%d.tmp" % (file_name, os.getpid())
+        with open(temp_file_name, "wb") as f:
+            pickle.dump(result, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file_name, file_name)
+        self.evict()
+
+    def _file_name(self, key):
+        digest = hashlib.sha256(json.dumps(
+            [self.result_format_version, key], sort_keys=True)
+            .encode()).hexdigest()
+        return os.path.join(self.directory, digest + ".pickle")
+
+    def evict(self):
+        """
+        Remove the least recently used results (by modification time, which
+        get_or_compute updates on each hit) until the total size is at most
+        max_bytes.
+        """
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pickle"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            pathlib.Path(path).unlink(missing_ok=True)
+            total_bytes -= size
+            self.profiler.count("result cache evictions")
+
+    def clear(self):
+        """
+        Remove all results.
+        """
+
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".pickle"):
+                    pathlib.Path(entry.path).unlink(missing_ok=True)
+
+
 class EsaExperimentData:
 
     def __init__(self):
         """
-        The variable all_scores contains one list of score-confidence pairs for
-        each PC and phase. Will be filled by read_all_score_files.
+        The variable all_scores contains one ScoreTable (which behaves like a
+        list of lists of score-confidence pairs) for each PC and phase, as a
+        list with a list of the tables of the PCs for each phase. Will be
+        filled by read_all_score_files (initially three phases with two PCs,
+        without scores). For the seed and the score_cache, see
+        compute_all_scores. The profiler records the time of the stages of
+        the analyses and counts the work done, see Profiler (by default, it
+        does nothing). For the result_cache (by default, None), see
+        cached_result.
         """
 
         self.all_scores = [[[], []], [[], []], [[], []]]
         self.use_ansi_colors = True
+        self.seed = None
+        self.score_cache = {}
+        self.profiler = null_profiler
+        self.result_cache = None
+        self._input_digest = (None, None)
 
     def read_score_file(self, file_name):
         """
@@ -142,7 +993,9 @@ class EsaExperimentData:
         (which, if it exists, is the PC score = average score from a vote). The
         confidences are always integers.
 
-        TODO: signal an error if one of the first six columns is empty.
+        If the file has malformed rows (for example, if one of the first six
+        columns is empty), a ScoreFileError listing all of them is raised, see
+        ScoreTable.from_lines.
 
         >>> with open("test.tsv", "w+") as f:
         ...     print("+1 4 -1 3 +0 3 __ _", file = f)
@@ -155,30 +1008,134 @@ class EsaExperimentData:
          [(3.0, 2), (-2.0, 5), (0.0, 3), (-1.0, 2), (-1.0, 5)]]
         """
 
-        all_scores = []
-        with open(file_name) as f:
-            for line in f:
-                entries = line.rstrip().split()
-                scores = list(map(float, entries[0:5:2]))
-                confis = list(map(int, entries[1:6:2]))
-
-                # Add score and confidence from columns 7 and 8 if non-empty
-                # and from columns 9 and 10 if they exist.
-                assert len(entries) >= 8, entries
-                if entries[7].isdigit():
-                    scores.append(float(entries[6]))
-                    confis.append(int(entries[7]))
-                if len(entries) == 10:
-                    scores.append(float(entries[8]))
-                    confis.append(int(entries[9]))
-
-                all_scores.append(list(zip(scores, confis)))
-        return all_scores
+        return list(self.read_score_table(file_name))
+
+    def read_score_table(self, file_name, cache_dir=None):
+        """
+        Like read_score_file, but return the result as a ScoreTable, where the
+        entries from columns 9 and 10 are marked as votes.
+
+        If a cache_dir is given, the parsed table is saved there as a .npy
+        file, and reading a score file with the same contents again just maps
+        that file into memory, without parsing.
+
+        >>> with open("test.tsv", "w+") as f:
+        ...     print("+1 4 -1 3 +0 3 __ _", file = f)
+        ...     print("+3 2 -2 5 +0 3 -1 2 -1 5", file = f)
+        >>> ee = EsaExperimentData()
+        >>> table = ee.read_score_table("test.tsv")
+        >>> table.num_reviews.tolist(), table.has_vote.tolist()
+        ([3, 4], [False, True])
+        >>> tables = [ee.read_score_table("test.tsv", "tmp/test-cache")
+        ...           for _ in range(2)]
+        >>> isinstance(tables[1].scores, np.memmap)
+        True
+        >>> list(tables[0]) == list(tables[1]) == list(table)
+        True
+        """
+
+        with self.profiler.stage("parse"):
+            with open(file_name, "rb") as f:
+                text = f.read()
+            if cache_dir is None:
+                table = ScoreTable.from_text(text, file_name)
+                self.profiler.count("lines parsed", len(table))
+                return table
+
+            # The name of the cached file is a hash of the contents of the
+            # score file, so a changed score file is never read from the
+            # cache.
+            digest = hashlib.sha256(
+                b"%d\n" % ScoreTable.record_format_version +
+                text).hexdigest()
+            cache_file_name = os.path.join(cache_dir, digest + ".npy")
+            try:
+                table = ScoreTable.from_records(
+                    np.load(cache_file_name, mmap_mode="r"))
+                self.profiler.count("parse cache hits")
+                return table
+            except (OSError, ValueError, EOFError):
+                pass
+            self.profiler.count("parse cache misses")
+            table = ScoreTable.from_text(text, file_name)
+            self.profiler.count("lines parsed", len(table))
+            pathlib.Path(cache_dir).mkdir(parents=True, exist_ok=True)
+            temp_file_name = "%s.%d.tmp" % (cache_file_name, os.getpid())
+            with open(temp_file_name, "wb") as f:
+                np.save(f, table.to_records())
+            os.replace(temp_file_name, cache_file_name)
+            return table
+
+    def read_score_chunks(self, file_name, chunk_size=65536):
+        """
+        Read a score file in chunks of chunk_size lines (the last chunk may
+        be shorter) and yield a ScoreTable for each chunk, so that only one
+        chunk at a time has to be in memory. The line numbers in a
+        ScoreFileError are those in the whole file.
 
-    def read_all_score_files(self):
+        >>> with open("test.tsv", "w+") as f:
+        ...     for i in range(5):
+        ...         print("+1 4 -1 3 +%d 3 __ _" % (i % 2), file = f)
+        >>> ee = EsaExperimentData()
+        >>> [len(chunk) for chunk in ee.read_score_chunks("test.tsv", 2)]
+        [2, 2, 1]
+        """
+
+        with open(file_name, "rb") as f:
+            first_line_number = 1
+            while True:
+                lines = list(itertools.islice(f, chunk_size))
+                if len(lines) == 0:
+                    return
+                yield ScoreTable.from_text(b"".join(lines), file_name,
+                                           first_line_number)
+                first_line_number += len(lines)
+
+    def stream_score_statistics(self, file_name1, file_name2, score_type,
+                                chunk_size=65536):
+        """
+        Compute the ScoreStatistics for the given score type for two score
+        files with the same papers in the same order. Both files are read
+        chunk by chunk (see read_score_chunks), so this also works for files
+        which are too large to be kept in memory. The confusion matrix is only
+        computed for the score types from score_labels_by_type.
+
+        The score types based on avr are not supported, because the score of
+        a paper depends on its position among all papers.
+
+        >>> with open("test.tsv", "w+") as f:
+        ...     for i in range(5):
+        ...         print("%+d 4 -1 3 +0 3 __ _" % (i % 3 - 1), file = f)
+        >>> ee = EsaExperimentData()
+        >>> stats = ee.stream_score_statistics("test.tsv", "test.tsv", "l5", 2)
+        >>> stats.num_papers, stats.means()
+        (5, [-0.8, -0.8])
+        >>> stats.confusion_matrix.tolist() # doctest: +NORMALIZE_WHITESPACE
+        [[0, 0, 0, 0, 0], [0, 0, 0, 0, 0], [0, 0, 1, 0, 0], [0, 0, 0, 4, 0],
+         [0, 0, 0, 0, 0]]
+        """
+
+        if score_type in ["avr", "avrt", "l5r", "l3r", "l2r"]:
+            raise ValueError("Score type \"%s\" cannot be computed chunk by "
+                             "chunk" % score_type)
+        stats = ScoreStatistics(score_labels_by_type.get(score_type))
+        for chunk1, chunk2 in itertools.zip_longest(
+                self.read_score_chunks(file_name1, chunk_size),
+                self.read_score_chunks(file_name2, chunk_size)):
+            if chunk1 is None or chunk2 is None or len(chunk1) != len(chunk2):
+                raise ValueError("%s and %s have a different number of lines"
+                                 % (file_name1, file_name2))
+            stats.add(self.compute_scores(chunk1, score_type),
+                      self.compute_scores(chunk2, score_type))
+        return stats
+
+    def read_all_score_files(self, cache_dir=None,
+                             pattern=score_file_pattern):
         """
-        Read the six score files (one of each of the two PC and for one of the
-        three phases) and remember them.
+        Read the score files (one for each PC and phase, see score_file_names
+        for the pattern) and remember them. In the experiment, these are six
+        files, for two PCs and three phases. For the cache_dir, see
+        read_score_table.
 
         The test cases below make a simple sanity check by testing whether the
         averages (which were also computed in a separate spreadsheet) are
@@ -207,19 +1164,24 @@ class EsaExperimentData:
         ['1.21', '2.00', '2.00', ..., '-2.00', '-1.30', '-2.00']
         """
 
-        self.all_scores[0][0] = self.read_score_file("scores-phase1-pc1.tsv")
-        self.all_scores[0][1] = self.read_score_file("scores-phase1-pc2.tsv")
-        self.all_scores[1][0] = self.read_score_file("scores-phase2-pc1.tsv")
-        self.all_scores[1][1] = self.read_score_file("scores-phase2-pc2.tsv")
-        self.all_scores[2][0] = self.read_score_file("scores-phase3-pc1.tsv")
-        self.all_scores[2][1] = self.read_score_file("scores-phase3-pc2.tsv")
+        self.all_scores = [[self.read_score_table(file_name, cache_dir)
+                            for file_name in file_names]
+                           for file_names in score_file_names(pattern)]
 
-    def compute_scores(self, score_confidence_pairs, score_type):
+    def compute_scores(self, score_confidence_pairs, score_type,
+                       computed=None, seed=None):
         """
         Given a list of lists of score-confidence pairs, compute a single score
         depending on the given type. See the usage_info string at the beginning
         of the file for the options, see the test cases for examples, and see
-        the code for details.
+        score_derivations and the code for details.
+
+        The scores of the parent types are only computed once. If a dictionary
+        computed is given, the scores of the types in it are taken from there
+        (they must be for the same score-confidence pairs), and all scores
+        computed on the way are added to it. If a seed is given, the random
+        score types do not use the global random generator, but one seeded
+        with the seed and the type, so that they are reproducible.
 
         Since the functions below already provide extensive unit tests for each
         of the types, the following test cases are deliberately simple and
@@ -264,83 +1226,210 @@ class EsaExperimentData:
         [1.375, 2.0, 0.0]
         """
 
+        if computed is None:
+            computed = {}
+        if score_type in computed:
+            return computed[score_type]
         sc_pairs = score_confidence_pairs
-        l5_to_l3u_map = {+2: +2, +1: +1, +0: -1, -1: -1, -2: -1}
-        l5_to_l3m_map = {+2: +1, +1: +1, +0: +0, -1: -1, -2: -1}
-        l5_to_l3l_map = {+2: +1, +1: +1, +0: -1, -1: -1, -2: -2}
-        l5_to_l2u_map = {+2: +2, +1: +0, +0: +0, -1: +0, -2: +0}
-        l5_to_l2m_map = {+2: +1, +1: +1, +0: -1, -1: -1, -2: -1}
-        l5_to_l2l_map = {+2: +0, +1: +0, +0: +0, -1: +0, -2: -2}
-        if score_type == "av":
-            return list(map(self.average_score, sc_pairs))
-        elif score_type == "l5":
-            return list(map(self.l5_score, sc_pairs))
-        elif score_type == "l3u":
-            return list(map(lambda x: l5_to_l3u_map[x],
-                            self.compute_scores(sc_pairs, "l5")))
-        elif score_type == "l3m":
-            return list(map(lambda x: l5_to_l3m_map[x],
-                            self.compute_scores(sc_pairs, "l5")))
-        elif score_type == "l3l":
-            return list(map(lambda x: l5_to_l3l_map[x],
-                            self.compute_scores(sc_pairs, "l5")))
-        elif score_type == "l2u":
-            return list(map(lambda x: l5_to_l2u_map[x],
-                            self.compute_scores(sc_pairs, "l5")))
-        elif score_type == "l2m":
-            return list(map(lambda x: l5_to_l2m_map[x],
-                            self.compute_scores(sc_pairs, "l5")))
-        elif score_type == "l2l":
-            return list(map(lambda x: l5_to_l2l_map[x],
-                            self.compute_scores(sc_pairs, "l5")))
-        elif score_type == "av5":
-            return list(map(lambda x: round(x),
-                            self.compute_scores(sc_pairs, "av")))
-        elif score_type == "av3u":
-            return list(map(lambda x: l5_to_l3u_map[x],
-                            self.compute_scores(sc_pairs, "av5")))
-        elif score_type == "av3m":
-            return list(map(lambda x: l5_to_l3m_map[x],
-                            self.compute_scores(sc_pairs, "av5")))
-        elif score_type == "av3l":
-            return list(map(lambda x: l5_to_l3l_map[x],
-                            self.compute_scores(sc_pairs, "av5")))
-        elif score_type == "av2u":
-            return list(map(lambda x: l5_to_l2u_map[x],
-                            self.compute_scores(sc_pairs, "av5")))
-        elif score_type == "av2m":
-            return list(map(lambda x: l5_to_l2m_map[x],
-                            self.compute_scores(sc_pairs, "av5")))
-        elif score_type == "av2l":
-            return list(map(lambda x: l5_to_l2l_map[x],
-                            self.compute_scores(sc_pairs, "av5")))
-        elif score_type == "avt":
-            return list(map(lambda av, l5: av if l5 > 0 else 0.0,
-                            self.compute_scores(sc_pairs, "av"),
-                            self.compute_scores(sc_pairs, "l5")))
-        elif score_type == "avr":
-            # Evenly spaced score from 2 to -2, with added Gaussian noise and
-            # truncated to [-2..2] again. Ignores scores from files.
-            return [min(2, max(-2,
-                    2 - 4 * score / (len(sc_pairs) - 1) +
-                    random.gauss(0, score_noise_standard_deviation)))
-                    for score in range(len(sc_pairs))]
-        elif score_type == "avrt":
-            return list(map(lambda avr, l5: avr if l5 > 0 else 0.0,
-                            self.compute_scores(sc_pairs, "avr"),
-                            self.compute_scores(sc_pairs, "l5")))
-        elif score_type == "l5r":
-            return list(map(lambda x: round(x),
-                            self.compute_scores(sc_pairs, "avr")))
-        elif score_type == "l3r":
-            return list(map(lambda x: l5_to_l3m_map[x],
-                            self.compute_scores(sc_pairs, "l5r")))
-        elif score_type == "l2r":
-            return list(map(lambda x: l5_to_l2m_map[x],
-                            self.compute_scores(sc_pairs, "l5r")))
-        elif score_type == "rnd":
-            return [random.random() * 4 - 2
-                    for _ in range(len(sc_pairs))]
+        rng = random if seed is None else \
+            random.Random("%s %s" % (seed, score_type))
+        with self.profiler.stage("score " + score_type):
+            if score_type == "av" and isinstance(sc_pairs, ScoreTable):
+                scores = sc_pairs.average_scores().tolist()
+            elif score_type == "av":
+                scores = list(map(self.average_score, sc_pairs))
+            elif score_type == "l5" and isinstance(sc_pairs, ScoreTable):
+                scores = sc_pairs.l5_scores().tolist()
+            elif score_type == "l5":
+                scores = list(map(self.l5_score, sc_pairs))
+            elif score_type == "avr":
+                # Evenly spaced score from 2 to -2, with added Gaussian noise
+                # and truncated to [-2..2] again. Ignores scores from files.
+                scores = [min(2, max(-2,
+                          2 - 4 * score / (len(sc_pairs) - 1) +
+                          rng.gauss(0, score_noise_standard_deviation)))
+                          for score in range(len(sc_pairs))]
+            elif score_type == "rnd":
+                scores = [rng.random() * 4 - 2
+                          for _ in range(len(sc_pairs))]
+            elif score_type in score_derivations:
+                parents, derive = score_derivations[score_type]
+                scores = derive(*[self.compute_scores(sc_pairs, parent,
+                                                      computed, seed)
+                                  for parent in parents])
+            else:
+                return None
+        computed[score_type] = scores
+        return scores
+
+    def compute_all_scores(self, score_type):
+        """
+        Compute the scores of the given type for each PC and phase, in the
+        same format as all_scores. The scores of all types computed on the
+        way (for example, l5 for l3u) are cached for each PC and phase, so
+        that each of them is computed only once, no matter how many types are
+        requested. The cache for a PC and phase is discarded when the
+        corresponding entry of all_scores is replaced (or the seed changes),
+        but not when it is changed in place, so a changed table has to be
+        replaced. The returned lists are copies, which can be changed without
+        changing the cache.
+
+        The random score types (see is_random_score_type) are only cached if
+        self.seed is set. Then the scores are reproducible (and not drawn
+        from the global random generator).
+
+        >>> ee = EsaExperimentData()
+        >>> ee.all_scores = [[[[(+2, 3), (+1, 2)]], [[(-1, 4), (-2, 5)]]],
+        ...                  [[[(+2, 3), (+2, 2)]], [[(+1, 3), (-1, 5)]]],
+        ...                  [[[(+0, 4), (+2, 3)]], [[(+2, 4), (+2, 5)]]]]
+        >>> ee.compute_all_scores("l3u")
+        [[[1], [-1]], [[1], [-1]], [[1], [2]]]
+        >>> ee.score_cache[0, 0][2]["l5"]
+        [1]
+        >>> ee.all_scores[0][0] = [[(-2, 3), (-1, 2)]]
+        >>> ee.compute_all_scores("l5")[0]
+        [[-2], [-2]]
+        >>> ee.compute_all_scores("l5")[0][0][0] = 2
+        >>> ee.compute_all_scores("l5")[0]
+        [[-2], [-2]]
+        >>> a, b = ee.compute_all_scores("rnd"), ee.compute_all_scores("rnd")
+        >>> a == b, "rnd" in ee.score_cache[0, 0][2]
+        (False, False)
+        >>> ee.seed = 5
+        >>> ee.compute_all_scores("rnd") == ee.compute_all_scores("rnd")
+        True
+        """
+
+        all_scores = [[None] * len(tables) for tables in self.all_scores]
+        for i, tables in enumerate(self.all_scores):
+            for j, table in enumerate(tables):
+                entry = self.score_cache.get((i, j))
+                if entry is None or entry[0] is not table or \
+                        entry[1] != self.seed:
+                    entry = (table, self.seed, {})
+                    self.score_cache[i, j] = entry
+                cached = entry[2]
+                self.profiler.count("score cache hits"
+                                    if score_type in cached else
+                                    "score cache misses")
+                if self.seed is None:
+                    computed = dict(cached)
+                    scores = self.compute_scores(table, score_type, computed)
+                    cached.update(item for item in computed.items()
+                                  if not is_random_score_type(item[0]))
+                else:
+                    scores = self.compute_scores(
+                        table, score_type, cached,
+                        "%d %d %d" % (self.seed, i, j))
+                all_scores[i][j] = list(scores)
+        return all_scores
+
+    def input_digest(self):
+        """
+        A hash of the contents of all_scores. It is only computed again when
+        an entry of all_scores is replaced.
+
+        >>> ee = EsaExperimentData()
+        >>> ee.all_scores = [[[[(+2, 3), (+1, 2)]], [[(-1, 4), (-2, 5)]]]]
+        >>> digest = ee.input_digest()
+        >>> ee.input_digest() == digest
+        True
+        >>> ee.all_scores[0][1] = [[(-1, 4), (-2, 4)]]
+        >>> ee.input_digest() == digest
+        False
+        """
+
+        tables = [table for tables in self.all_scores for table in tables]
+        last_tables, digest = self._input_digest
+        if last_tables is None or len(last_tables) != len(tables) or \
+                any(a is not b for a, b in zip(last_tables, tables)):
+            sha = hashlib.sha256(b"%d %d\n" % (len(self.all_scores),
+                                               len(self.all_scores[0])))
+            for table in tables:
+                if not isinstance(table, ScoreTable):
+                    table = ScoreTable.from_pairs(table)
+                sha.update(table.to_records().tobytes())
+            digest = sha.hexdigest()
+            self._input_digest = (tables, digest)
+        return digest
+
+    def cached_result(self, score_types, mode, parameters, compute):
+        """
+        Return compute(), or, if result_cache is set, its result from the
+        cache, when it was computed before for the same input (see
+        input_digest), score types, mode, parameters (a dictionary),
+        num_accepted, score_noise_standard_deviation, and seed (only for the
+        random score types, whose scores depend on it), and by the same
+        version of the code (see ResultCache.result_format_version).
+
+        Results which are random are not cached: those with a parameter
+        "seed" which is None, and those for a random score type (see
+        is_random_score_type) when self.seed is None. Neither are results
+        for a score type None (that is, for scores of an unknown type).
+
+        >>> ee = EsaExperimentData()
+        >>> ee.all_scores = [[[[(+2, 3), (+1, 2)]], [[(-1, 4), (-2, 5)]]]]
+        >>> ee.result_cache = ResultCache("tmp/test-results")
+        >>> ee.result_cache.clear()
+        >>> ee.cached_result(["l5"], "kendall", {}, lambda: [1.0, 1.0, 1.0])
+        [1.0, 1.0, 1.0]
+        >>> ee.cached_result(["l5"], "kendall", {}, lambda: None)
+        [1.0, 1.0, 1.0]
+        >>> ee.seed = 5
+        >>> ee.cached_result(["l5"], "kendall", {}, lambda: None)
+        [1.0, 1.0, 1.0]
+        >>> ee.cached_result(["l5"], "rtest", {"seed": None}, lambda: 0.5)
+        0.5
+        >>> ee.cached_result(["l5"], "rtest", {"seed": None}, lambda: 0.7)
+        0.7
+        """
+
+        key = self.result_key(score_types, mode, parameters)
+        if key is None:
+            return compute()
+        return self.result_cache.get_or_compute(key, compute)
+
+    def result_key(self, score_types, mode, parameters):
+        """
+        The key of the result_cache for cached_result, or None if the result
+        is not cached.
+        """
+
+        is_random = any(map(is_random_score_type, score_types))
+        if self.result_cache is None or None in score_types or \
+                parameters.get("seed", 0) is None or \
+                self.seed is None and is_random:
+            return None
+        return [self.input_digest(), score_types, mode, parameters,
+                num_accepted, score_noise_standard_deviation,
+                self.seed if is_random else None]
+
+    def resampled_scores(self, table, score_type, num_samples, seed=None):
+        """
+        Resample the reviews of each paper in the given ScoreTable (see
+        ScoreTable.resample_reviews) num_samples times, and compute the
+        scores of the given type for all papers and resamples at once.
+        Returns an array of shape (num_samples, number of papers). The random
+        score types do not depend on the reviews, so they are not supported.
+
+        >>> ee = EsaExperimentData()
+        >>> table = ScoreTable.from_pairs([[(+2, 4), (+2, 3), (+2, 3)],
+        ...                                [(+2, 4), (+0, 3), (-2, 3)]])
+        >>> scores = ee.resampled_scores(table, "l5", 1000, seed=1)
+        >>> scores.shape, sorted(set(scores[:, 0].tolist()))
+        ((1000, 2), [2])
+        >>> sorted(set(scores[:, 1].tolist()))
+        [-2, -1, 1, 2]
+        """
+
+        if is_random_score_type(score_type) or \
+                score_type not in score_type_names:
+            raise ValueError("Score type \"%s\" cannot be computed from "
+                             "resampled reviews" % score_type)
+        resampled = table.resample_reviews(num_samples,
+                                           np.random.default_rng(seed))
+        return np.array(self.compute_scores(resampled, score_type)).reshape(
+            num_samples, len(table))
 
     def average_score(self, score_confidence_pairs):
         """
@@ -430,9 +1519,10 @@ class EsaExperimentData:
          [[1, -1, 0, 0, -1, 0, 3, -2, 0, -2], []], [[], []]]
         """
 
-        individual_scores = [[[], []], [[], []], [[], []]]
-        for i in range(3):
-            for j in range(2):
+        individual_scores = [[[] for _ in tables]
+                             for tables in self.all_scores]
+        for i, tables in enumerate(self.all_scores):
+            for j in range(len(tables)):
                 for k in range(len(self.all_scores[i][j])):
                     for l, pair in enumerate(self.all_scores[i][j][k]):
                         if i == 0 or l < len(self.all_scores[0][j][k]):
@@ -440,16 +1530,34 @@ class EsaExperimentData:
         return individual_scores
 
 
-    def rtest(self, scores):
+    def rtest(self, scores, num_samples=2048, method="loop", seed=None,
+              num_workers=1, alpha=None, score_type=None):
         """
-        Compute p-value of R-test for given scores for each phase.
+        Compute p-value of R-test for given scores for each pair of phases
+        (consecutive phases first) and each pair of PCs.
+
+        If a seed is given, the result is reproducible, and the p-values are
+        taken from the result cache if possible (see cached_result; for
+        method loop, together with the state of the random generator after
+        the comparison). The method is one of:
+
+        loop: the plain loops below, one sample after the other.
+        batch: the samples are drawn and evaluated in blocks with NumPy, see
+        function rtest_p_value_batch below. This is orders of magnitude faster
+        and makes 100K samples and more feasible. Only then the blocks can be
+        distributed over num_workers processes, and sampling stops early if
+        alpha is given and the p-value is clearly above or below it.
+        walk: samples visited by a random walk, see class IncrementalRTest.
+        exact: enumerate all samples, see class IncrementalRTest. If there
+        are too many papers which differ between the two phases, fall back
+        to method walk.
         """
         
         ranking_similarity = \
-                lambda s1, s2: corr(kendall_tau_b(s1, s2))
+                lambda s1, s2: 1 - 2 * kendall_tau_b_from_statistics(
+                    kendall_pair_statistics(s1, s2))
         #        lambda s1, s2: overlap_topk(s1, s2, num_accepted)
         n = len(scores[0][0])
-        num_samples = 2048
         print()
         print("R-Test ... #scores = %d, #samples = %d" %
                 (n, num_samples))
@@ -458,31 +1566,90 @@ class EsaExperimentData:
         scores_A_pc2 = [0] * n
         scores_B_pc1 = [0] * n
         scores_B_pc2 = [0] * n
-        for i1, i2 in [(0,1), (1, 2), (0,2)]:
-            tau_1 = ranking_similarity(scores[i1][0], scores[i1][1])
-            tau_2 = ranking_similarity(scores[i2][0], scores[i2][1])
-            diff_observed = tau_1 - tau_2
-            count = 0
-            for j in range(num_samples):
-                for k in range(n):
-                    if random.randint(0, 1) == 1:
-                        scores_A_pc1[k] = scores[i1][0][k]
-                        scores_A_pc2[k] = scores[i1][1][k]
-                        scores_B_pc1[k] = scores[i2][0][k]
-                        scores_B_pc2[k] = scores[i2][1][k]
-                    else:
-                        scores_A_pc1[k] = scores[i2][0][k]
-                        scores_A_pc2[k] = scores[i2][1][k]
-                        scores_B_pc1[k] = scores[i1][0][k]
-                        scores_B_pc2[k] = scores[i1][1][k]
-                tau_A = ranking_similarity(scores_A_pc1, scores_A_pc2)
-                tau_B = ranking_similarity(scores_B_pc1, scores_B_pc2)
-                diff = tau_A - tau_B
-                if abs(diff) >= abs(diff_observed):
-                    count += 1
-            p_value = count / num_samples
-            print("Phase %d <-> %d : p = %.2f   (%.2f <-> %.2f)"
-                    % (i1 + 1, i2 + 1, p_value, tau_1, tau_2))
+        rng = random.Random(seed)
+        phase_pairs = sorted(itertools.combinations(range(len(scores)), 2),
+                             key=lambda pair: (pair[1] - pair[0], pair[0]))
+        num_pcs = len(scores[0])
+        for (j1, j2), (i1, i2) in itertools.product(
+                itertools.combinations(range(num_pcs), 2), phase_pairs):
+            scores_1 = [scores[i1][j1], scores[i1][j2]]
+            scores_2 = [scores[i2][j1], scores[i2][j2]]
+            label = "" if num_pcs == 2 else \
+                ", PCs %d <-> %d" % (j1 + 1, j2 + 1)
+            tau_1 = ranking_similarity(*scores_1)
+            tau_2 = ranking_similarity(*scores_2)
+            parameters = {"phases": [i1 + 1, i2 + 1],
+                          "pcs": [j1 + 1, j2 + 1],
+                          "num_samples": num_samples, "seed": seed}
+            if method in ["walk", "exact"]:
+                def compute():
+                    with self.profiler.stage("rtest " + method):
+                        result = rtest_p_value(scores_1, scores_2,
+                                               num_samples, method, seed)
+                    if result[1].startswith("random walk"):
+                        self.profiler.count("rtest samples drawn",
+                                            num_samples)
+                    return result
+
+                p_value, comment = self.cached_result(
+                    [score_type], "rtest-" + method, parameters, compute)
+                print("Phase %d <-> %d%s : p = %.2f   (%.2f <-> %.2f)   [%s]"
+                      % (i1 + 1, i2 + 1, label, p_value, tau_1, tau_2,
+                         comment))
+                continue
+            if method == "batch":
+                def compute():
+                    with self.profiler.stage("rtest batch"):
+                        result = rtest_p_value_batch(
+                            scores_1, scores_2, num_samples, seed=seed,
+                            num_workers=num_workers, alpha=alpha)
+                    self.profiler.count("rtest samples drawn", result[1])
+                    self.profiler.count("paper pairs compared",
+                                        result[1] * n * (n - 1))
+                    return result
+
+                p_value, num_samples_used = self.cached_result(
+                    [score_type], "rtest-batch", dict(parameters, alpha=alpha),
+                    compute)
+                print("Phase %d <-> %d%s : p = %.2f   (%.2f <-> %.2f)%s"
+                      % (i1 + 1, i2 + 1, label, p_value, tau_1, tau_2,
+                         "   [stopped after %d samples]" % num_samples_used
+                         if num_samples_used < num_samples else ""))
+                continue
+
+            def compute():
+                diff_observed = tau_1 - tau_2
+                count = 0
+                self.profiler.count("rtest samples drawn", num_samples)
+                self.profiler.count("paper pairs compared",
+                                    num_samples * n * (n - 1))
+                with self.profiler.stage("rtest loop"):
+                    for j in range(num_samples):
+                        for k in range(n):
+                            if rng.randint(0, 1) == 1:
+                                scores_A_pc1[k] = scores_1[0][k]
+                                scores_A_pc2[k] = scores_1[1][k]
+                                scores_B_pc1[k] = scores_2[0][k]
+                                scores_B_pc2[k] = scores_2[1][k]
+                            else:
+                                scores_A_pc1[k] = scores_2[0][k]
+                                scores_A_pc2[k] = scores_2[1][k]
+                                scores_B_pc1[k] = scores_1[0][k]
+                                scores_B_pc2[k] = scores_1[1][k]
+                        tau_A = ranking_similarity(scores_A_pc1,
+                                                   scores_A_pc2)
+                        tau_B = ranking_similarity(scores_B_pc1,
+                                                   scores_B_pc2)
+                        diff = tau_A - tau_B
+                        if abs(diff) >= abs(diff_observed):
+                            count += 1
+                return count / num_samples, rng.getstate()
+
+            p_value, rng_state = self.cached_result(
+                [score_type], "rtest-loop", parameters, compute)
+            rng.setstate(rng_state)
+            print("Phase %d <-> %d%s : p = %.2f   (%.2f <-> %.2f)"
+                    % (i1 + 1, i2 + 1, label, p_value, tau_1, tau_2))
 
 
     def print_scores(self, scores, scores_file_base_name, subdir_name):
@@ -498,8 +1665,8 @@ class EsaExperimentData:
         pathlib.Path(subdir_name).mkdir(exist_ok=True)
         base_name = scores_file_base_name
         file_names = []
-        for i in range(3):
-            for j in range(2):
+        for i in range(len(scores)):
+            for j in range(len(scores[i])):
                 file_name = "tmp/%s-phase%d-pc%d.txt" % (base_name, i, j)
                 file_names.append(file_name)
                 with open(file_name, "w+") as file:
@@ -540,77 +1707,262 @@ class EsaExperimentData:
         with open(gnuplot_script_name, "w+") as gnuplot_script_file:
             print(gnuplot_script, file=gnuplot_script_file)
 
-    def print_kendall_tau(self, scores):
+    def kendall_correlations(self, scores, num_workers=1, score_type=None):
+        """
+        The Kendall tau correlations (a, b, p) for the comparisons from
+        pc_comparisons (all groups, one after the other), for scores like
+        all_scores of the given score type. They are computed all at once,
+        over num_workers processes (or taken from the result cache, see
+        cached_result).
+        """
+
+        # All three variants are computed from the same pair statistics, so
+        # that each pair of score lists is only processed once. They are
+        # correlations (-1..1) instead of distances (0..1), where distance 0
+        # corresponds to correlation 1 and distance 1 to correlation -1.
+        groups = pc_comparisons(len(scores), len(scores[0]))
+        return self.cached_result(
+            [score_type], "kendall", {},
+            lambda: kendall_correlations_pairs(
+                [(scores[i1][j1], scores[i2][j2]) for group in groups
+                 for _, (i1, j1), (i2, j2) in group], num_workers,
+                self.profiler).T.tolist())
+
+    def print_kendall_tau(self, scores, num_workers=1, score_type=None):
         """
         Print statistics for the given score type. See the usage_info string at
         the beginning of this file for the options. See function compute_scores
         for the details of how the scores are computed for each type.
+
+        The comparisons are those from pc_comparisons, see
+        kendall_correlations.
         """
 
-        # Compute correlation (-1..1) instead of distance (0..1), where distance
-        # 0 corresponds to correlation 1 and distance 0 corresponds to
-        # correlation -1.
-        trafo = lambda x: 1 - 2 * x
+        groups = pc_comparisons(len(scores), len(scores[0]))
+        correlations = iter(self.kendall_correlations(scores, num_workers,
+                                                      score_type))
+
         print()
         print("Kendall tau correlation (a / b / p) "
               "between PCs and phases:")
         # print("Normalized Kendall tau distance (a / b / p) "
         #       "between PCs and phases:")
-        print()
-        tau_a_1 = trafo(kendall_tau_a(scores[0][0], scores[0][1]))
-        tau_a_2 = trafo(kendall_tau_a(scores[1][0], scores[1][1]))
-        tau_a_3 = trafo(kendall_tau_a(scores[2][0], scores[2][1]))
-        tau_b_1 = trafo(kendall_tau_b(scores[0][0], scores[0][1]))
-        tau_b_2 = trafo(kendall_tau_b(scores[1][0], scores[1][1]))
-        tau_b_3 = trafo(kendall_tau_b(scores[2][0], scores[2][1]))
-        tau_p_1 = trafo(kendall_tau_p(scores[0][0], scores[0][1]))
-        tau_p_2 = trafo(kendall_tau_p(scores[1][0], scores[1][1]))
-        tau_p_3 = trafo(kendall_tau_p(scores[2][0], scores[2][1]))
-        print("Phase 1: %.2f / %.2f / %.2f" % (tau_a_1, tau_b_1, tau_p_1))
-        print("Phase 2: %.2f / %.2f / %.2f" % (tau_a_2, tau_b_2, tau_p_2))
-        print("Phase 3: %.2f / %.2f / %.2f" % (tau_a_3, tau_b_3, tau_p_3))
-        print()
-        tau_a_pc1_12 = trafo(kendall_tau_a(scores[0][0], scores[1][0]))
-        tau_a_pc1_23 = trafo(kendall_tau_a(scores[1][0], scores[2][0]))
-        tau_a_pc2_12 = trafo(kendall_tau_a(scores[0][1], scores[1][1]))
-        tau_a_pc2_23 = trafo(kendall_tau_a(scores[1][1], scores[2][1]))
-        tau_b_pc1_12 = trafo(kendall_tau_b(scores[0][0], scores[1][0]))
-        tau_b_pc1_23 = trafo(kendall_tau_b(scores[1][0], scores[2][0]))
-        tau_b_pc2_12 = trafo(kendall_tau_b(scores[0][1], scores[1][1]))
-        tau_b_pc2_23 = trafo(kendall_tau_b(scores[1][1], scores[2][1]))
-        tau_p_pc1_12 = trafo(kendall_tau_p(scores[0][0], scores[1][0]))
-        tau_p_pc1_23 = trafo(kendall_tau_p(scores[1][0], scores[2][0]))
-        tau_p_pc2_12 = trafo(kendall_tau_p(scores[0][1], scores[1][1]))
-        tau_p_pc2_23 = trafo(kendall_tau_p(scores[1][1], scores[2][1]))
-        print("Phases 1 <-> 2, PC1: %.2f / %.2f / %.2f"
-              % (tau_a_pc1_12, tau_b_pc1_12, tau_p_pc1_12))
-        print("Phases 1 <-> 2, PC2: %.2f / %.2f / %.2f"
-              % (tau_a_pc2_12, tau_b_pc2_12, tau_p_pc2_12))
-        print()
-        print("Phases 2 <-> 3, PC1: %.2f / %.2f / %.2f"
-              % (tau_a_pc1_23, tau_b_pc1_23, tau_p_pc1_23))
-        print("Phases 2 <-> 3, PC2: %.2f / %.2f / %.2f"
-              % (tau_a_pc2_23, tau_b_pc2_23, tau_p_pc2_23))
+        for group in groups:
+            print()
+            for label, _, _ in group:
+                print("%s: %.2f / %.2f / %.2f"
+                      % (label, *next(correlations)))
+
+    def print_bootstrap_intervals(self, scores, num_samples=10000,
+                                  seed=None, confidence=0.95):
+        """
+        Print the Kendall tau correlations from print_kendall_tau and the
+        overlap of the top num_accepted papers between the PCs, each with a
+        bootstrap percentile interval. The papers are resampled with
+        replacement, and the same resamples are used for all statistics and
+        all phases (see bootstrap_statistics).
+        """
+
+        samples = bootstrap_samples(len(scores[0][0]), num_samples, seed)
+
+        def format_taus(values, intervals):
+            return " / ".join("%.2f [%.2f, %.2f]"
+                              % (values[v], intervals[0, v], intervals[1, v])
+                              for v in range(3))
+
+        print()
+        print("Kendall tau correlation (a / b / p) between PCs and phases, "
+              "with %d%% bootstrap" % round(100 * confidence))
+        print("intervals (%d resamples of the papers):" % num_samples)
+        with self.profiler.stage("bootstrap"):
+            groups = bootstrap_intervals(scores, samples, confidence)
+        self.profiler.count("bootstrap samples drawn", num_samples)
+        overlaps = []
+        for group in groups:
+            print()
+            for label, (i1, _), (i2, _), values, intervals in group:
+                if i1 == i2:
+                    overlaps.append((label, values[3], intervals[0, 3],
+                                     intervals[1, 3]))
+                print("%s: %s" % (label, format_taus(values, intervals)))
+        print()
+        print("Overlap between PCs of the top %d papers, with the same "
+              "intervals:" % num_accepted)
+        print()
+        for label, overlap, low, high in overlaps:
+            print("%s: %3d%% [%3d%%, %3d%%]"
+                  % (label, round(100 * overlap), round(100 * low),
+                     round(100 * high)))
+
+    def decision_stability(self, scores, score_type, num_samples=10000,
+                           seed=None):
+        """
+        The computation for print_decision_stability. Returns the list of
+        (phase, PC) pairs, and for each of them (one row each) the flip
+        probability of each paper and whether it is accepted, as arrays.
+        """
+
+        phases_and_pcs = [(i, j) for i in range(len(scores))
+                          for j in range(len(scores[i]))]
+        seeds = np.random.SeedSequence(seed).spawn(len(phases_and_pcs))
+        flip_probabilities = []
+        decisions = []
+        for (i, j), phase_and_pc_seed in zip(phases_and_pcs, seeds):
+            with self.profiler.stage("decision stability"):
+                resampled = self.resampled_scores(
+                    self.all_scores[i][j], score_type, num_samples,
+                    phase_and_pc_seed)
+                probabilities, is_accepted = decision_flip_probabilities(
+                    scores[i][j], resampled)
+            self.profiler.count("review resamples drawn", num_samples)
+            flip_probabilities.append(probabilities)
+            decisions.append(is_accepted)
+        return (phases_and_pcs, np.array(flip_probabilities),
+                np.array(decisions))
+
+    def print_decision_stability(self, scores, score_type,
+                                 num_samples=10000, seed=None,
+                                 min_probability=0.05):
+        """
+        Print, for each phase and PC, how likely the accept/reject decision
+        for a paper (whether it is among the top num_accepted) flips when
+        the reviews of each paper are resampled, see resampled_scores and
+        decision_flip_probabilities. Only papers for which this probability
+        is at least min_probability for some phase and PC are shown.
+        """
+
+        phases_and_pcs, flip_probabilities, decisions = \
+            self.decision_stability(scores, score_type, num_samples, seed)
+        is_fragile = flip_probabilities.max(axis=0) >= min_probability
+
+        print()
+        print("Probability that the decision for a paper (A = among the top "
+              "%d, - = not) flips" % num_accepted)
+        print("when the reviews of each paper are resampled (%d resamples), "
+              "for the %d papers"
+              % (num_samples, np.count_nonzero(is_fragile)))
+        print("where it is at least %d%% for some phase and PC:"
+              % round(100 * min_probability))
+        print()
+        print("Paper  %s" % "  ".join("P%d PC%d" % (i + 1, j + 1)
+                                      for i, j in phases_and_pcs))
+        for k in np.flatnonzero(is_fragile).tolist():
+            print("%5d  %s" % (k + 1, "  ".join(
+                "%s %3d%%" % ("A" if decisions[c][k] else "-",
+                              round(100 * flip_probabilities[c, k]))
+                for c in range(len(phases_and_pcs)))))
+
+    def print_noise_calibration(self, score_type, num_simulations=2000,
+                                seed=None):
+        """
+        Print the standard deviation of the noise for the given random score
+        type (see simulated_score_types) for which the simulated scores have
+        the same Kendall tau correlation between the PCs as the real scores
+        of the corresponding type, for each phase (and pair of PCs). See
+        calibrate_noise.
+        """
+
+        real_score_type = simulated_score_types[score_type]
+        real_scores = self.compute_all_scores(real_score_type)
+        print()
+        print("Noise standard deviation for \"%s\", for which the Kendall "
+              "tau correlation (a / b / p)" % score_type)
+        print("between the PCs is the same as for \"%s\" (with 95%% "
+              "confidence band, %d simulations):"
+              % (real_score_type, num_simulations))
+        print()
+        comparisons = pc_comparisons(len(real_scores),
+                                     len(real_scores[0]))[0]
+        observed_taus = kendall_correlations_pairs(
+            [(real_scores[i1][j1], real_scores[i2][j2])
+             for _, (i1, j1), (i2, j2) in comparisons],
+            profiler=self.profiler).T.tolist()
+        with self.profiler.stage("noise calibration"):
+            all_calibrations = calibrate_noise(
+                observed_taus, len(real_scores[0][0]), score_type,
+                num_simulations, seed)
+        for (label, _, _), calibrations in zip(comparisons, all_calibrations):
+            print("%s: %s" % (label, " / ".join(
+                "%.2f [%.2f, %.2f] for %.2f"
+                % (c.sigma, c.sigma_low, c.sigma_high, c.observed)
+                for c in calibrations)))
+
+    def print_conference_simulation(self, score_type, num_conferences,
+                                    num_papers, num_accepted, seed=None,
+                                    num_workers=1):
+        """
+        Simulate conferences for the given score type (avr, l5r, or rnd), see
+        simulate_conferences, and print the distribution of the overlap of
+        the accepted papers and of the Kendall tau correlations.
+        """
 
-    def print_overlap(self, scores, subdir_name):
+        with self.profiler.stage("conference simulation"):
+            result = simulate_conferences(num_conferences, num_papers,
+                                          num_accepted, score_type,
+                                          seed=seed, num_workers=num_workers)
+        self.profiler.count("conferences simulated", num_conferences)
+        print()
+        print("Overlap and Kendall tau correlation between the PCs for %d "
+              "simulated conferences" % num_conferences)
+        print("with %d papers, %d of them accepted (noise standard deviation "
+              "%.2f):" % (num_papers, num_accepted,
+                          score_noise_standard_deviation))
+        print()
+        percentiles = [5, 25, 50, 75, 95]
+        print("%-10s %6s %6s   %s" % ("", "mean", "sd", "  ".join(
+            "%4d%%" % p for p in percentiles)))
+        for name, values in [("Overlap", result.overlaps),
+                             ("Tau a", result.taus[0]),
+                             ("Tau b", result.taus[1]),
+                             ("Tau p", result.taus[2])]:
+            print("%-10s %6.2f %6.2f   %s" % (
+                name, np.nanmean(values), np.nanstd(values), "  ".join(
+                    "%5.2f" % x for x in np.nanpercentile(values,
+                                                          percentiles))))
+        print()
+        print("Distribution of the number of papers accepted by both PCs:")
+        print()
+        counts = np.bincount(np.round(result.overlaps * num_accepted)
+                             .astype(int), minlength=num_accepted + 1)
+        for overlap, count in enumerate(counts.tolist()):
+            if count > 0:
+                print("%3d: %5.1f%%"
+                      % (overlap, 100 * count / num_conferences))
+
+    def print_overlap(self, scores, subdir_name, random_ties=False,
+                      score_type=None):
         """
         Print overlap of the set of accepted papers for a selection of
-        thresholds for the number of accepted papers.
+        thresholds for the number of accepted papers. With random_ties, print
+        the expected overlap when papers with the same score at the threshold
+        are picked at random (see expected_overlap_topk). The overlaps are
+        taken from the result cache if possible, see cached_result.
         """
 
+        # One curve for each pair of PCs and each phase. The overlaps of the
+        # phases are printed as a sequence, one sequence for each pair of PCs.
+        num_phases = len(scores)
+        pc_pairs = list(itertools.combinations(range(len(scores[0])), 2))
         print()
-        print("Overlap between PCs for the three phases for various "
-              "thresholds for the number k of accepted papers:")
+        print("%s between PCs for the %s phases for various "
+              "thresholds for the number k of accepted papers%s:"
+              % ("Expected overlap" if random_ties else "Overlap",
+                 "three" if num_phases == 3 else num_phases,
+                 ", with ties broken at random" if random_ties else ""))
+        if len(pc_pairs) > 1:
+            print("(one sequence for each of the pairs of PCs %s)"
+                  % ", ".join("%d/%d" % (j1 + 1, j2 + 1)
+                              for j1, j2 in pc_pairs))
         print()
+        curves = self.overlap_curves(scores, random_ties, score_type)
         overlaps = []
         for k in range(1, len(scores[0][0])):
             k_perc = round(100 * k / len(scores[0][0]))
-            o_1 = round(100 * overlap_topk(scores[0][0], scores[0][1], k))
-            o_2 = round(100 * overlap_topk(scores[1][0], scores[1][1], k))
-            o_3 = round(100 * overlap_topk(scores[2][0], scores[2][1], k))
-            overlaps.append((o_1, o_2, o_3))
-            print("k = %2d (%2d%%): %3d%% ->%3d%% ->%3d%%" %
-                    (k, k_perc, o_1, o_2, o_3))
+            overlaps.append([round(100 * curve[k - 1]) for curve in curves])
+            print("k = %2d (%2d%%): %s" % (k, k_perc, "   ".join(
+                " ->".join("%3d%%" % o for o in overlaps[-1][
+                    p * num_phases:(p + 1) * num_phases])
+                for p in range(len(pc_pairs)))))
 
         print()
         print("Printing overlaps to sub-directory \"%s\"" % subdir_name)
@@ -618,11 +1970,14 @@ class EsaExperimentData:
 
         pathlib.Path(subdir_name).mkdir(exist_ok=True)
         file_names = []
-        for i in range(3):
-           file_name = "tmp/overlaps-phase%d.txt" % (i + 1)
+        for c, ((j1, j2), i) in enumerate(
+                itertools.product(pc_pairs, range(num_phases))):
+           file_name = "tmp/overlaps-phase%d%s.txt" % (
+               i + 1, "" if len(pc_pairs) == 1 else
+               "-pcs%d-%d" % (j1 + 1, j2 + 1))
            file_names.append(file_name)
            with open(file_name, "w+") as file:
-               file.writelines("%d\n" % o[i] for o in overlaps)
+               file.writelines("%d\n" % o[c] for o in overlaps)
 
         gnuplot_script_name = "%s/plot-overlaps.p" % subdir_name
         print("Writing gnuplot script to show overlaps, call like this:")
@@ -643,10 +1998,30 @@ class EsaExperimentData:
             print(gnuplot_script, file=gnuplot_script_file)
 
 
+    def overlap_curves(self, scores, random_ties=False, score_type=None):
+        """
+        The overlap curves printed by print_overlap (see overlap_curve), one
+        for each pair of PCs and each phase (the phases first), as a list of
+        lists (taken from the result cache if possible, see cached_result).
+        """
+
+        def compute():
+            with self.profiler.stage("overlap sweep"):
+                return [overlap_curve(scores[i][j1], scores[i][j2],
+                                      random_ties).tolist()
+                        for j1, j2 in itertools.combinations(
+                            range(len(scores[0])), 2)
+                        for i in range(len(scores))]
+
+        return self.cached_result(
+            [score_type], "overlap-random-ties" if random_ties else "overlap",
+            {}, compute)
+
     def print_confusion_matrices(self, scores, score_type, mode):
         """
         Print confusion matrices between PCs (mode == "pcs") or between phases
-        (mode == "phases") side by side.
+        (mode == "phases") side by side. The matrices are taken from the
+        result cache if possible, see cached_result.
         """
 
         if score_type in score_labels_by_type:
@@ -658,44 +2033,344 @@ class EsaExperimentData:
             print()
             return
 
-        if mode == "pcs":
+        num_phases = len(scores)
+        num_pcs = len(scores[0])
+        phases = ", ".join(str(i + 1) for i in range(num_phases))
+        consecutive_phases = ", ".join(
+            "PC%d %d/%d" % (j + 1, i + 1, i + 2)
+            for j in range(num_pcs) for i in range(num_phases - 1))
+        if mode == "pcs" and num_pcs == 2:
+            print()
+            print("Confusion matrices between the two PCs after phases %s:"
+                  % phases)
             print()
-            print("Confusion matrices between the two PCs after phases 1, 2, 3:")
+        elif mode == "pcs":
+            print()
+            print("Confusion matrices between the PCs (%s) after phases %s:"
+                  % (", ".join("%d/%d" % pair for pair in
+                               itertools.combinations(range(1, num_pcs + 1),
+                                                      2)), phases))
             print()
-            score_list_pairs = [(scores[0][0], scores[0][1]),
-                                (scores[1][0], scores[1][1]),
-                                (scores[2][0], scores[2][1])]
-            self.print_confusion_matrices_helper(score_list_pairs,
-                                                 score_labels)
         elif mode == "phases":
             print()
             print("Confusion matrices between phases for per-paper scores "
-                  "(PC1 1/2, PC1 2/3, PC2 1/2, PC2 2/3):")
+                  "(%s):" % consecutive_phases)
             print()
-            score_list_pairs = [(scores[0][0], scores[1][0]),
-                                (scores[1][0], scores[2][0]),
-                                (scores[0][1], scores[1][1]),
-                                (scores[1][1], scores[2][1])]
-            self.print_confusion_matrices_helper(score_list_pairs,
-                                                 score_labels)
-
         elif mode == "phases-individual-scores":
             print()
             print("Confusion matrices between phases for individual scores "
-                  "(PC1 1/2, PC1 2/3, PC2 1/2, PC2 2/3):")
+                  "(%s):" % consecutive_phases)
             print()
-            indiv_scores = self.compute_individual_scores()
-            score_list_pairs = [(indiv_scores[0][0], indiv_scores[1][0]),
-                                (indiv_scores[1][0], indiv_scores[2][0]),
-                                (indiv_scores[0][1], indiv_scores[1][1]),
-                                (indiv_scores[1][1], indiv_scores[2][1])]
-            self.print_confusion_matrices_helper(score_list_pairs,
-                                                 score_labels)
-
-    def print_confusion_matrices_helper(self, score_list_pairs, score_labels):
-        """
-        Compute the confusion matrices for the given pairs of scores and print
-        them side by side from left to right. Each score must be contained in
+        else:
+            return
+        self.print_confusion_matrices_helper(
+            None, score_labels,
+            self.mode_confusion_matrices(scores, score_type, mode))
+
+    def mode_confusion_matrices(self, scores, score_type, mode):
+        """
+        The confusion matrices printed by print_confusion_matrices, as a list
+        (taken from the result cache if possible, see cached_result).
+        """
+
+        def compute():
+            with self.profiler.stage("confusion"):
+                return confusion_matrices(
+                    self.confusion_score_list_pairs(scores, mode),
+                    score_labels_by_type[score_type]).tolist()
+
+        return self.cached_result([score_type], "confusion-" + mode, {},
+                                  compute)
+
+    def confusion_score_list_pairs(self, scores, mode):
+        """
+        The pairs of score lists compared by print_confusion_matrices for the
+        given mode: each pair of PCs after each phase (mode == "pcs"), or
+        consecutive phases for each PC, for per-paper scores (mode ==
+        "phases") or individual scores (mode == "phases-individual-scores").
+        """
+
+        if mode == "pcs":
+            return [(scores[i1][j1], scores[i2][j2]) for _, (i1, j1), (i2, j2)
+                    in pc_comparisons(len(scores), len(scores[0]))[0]]
+        if mode == "phases-individual-scores":
+            scores = self.compute_individual_scores()
+        return [(scores[i][j], scores[i + 1][j])
+                for j in range(len(scores[0]))
+                for i in range(len(scores) - 1)]
+
+    def all_confusion_matrices(self, mode, score_types=None):
+        """
+        Compute the confusion matrices for the given mode (see
+        confusion_score_list_pairs) for several score types at once, by
+        default for all score types from score_labels_by_type which are not
+        random. Returns a dictionary with an array like that of
+        confusion_matrices for each score type.
+
+        >>> ee = EsaExperimentData()
+        >>> ee.all_scores = [[[[(+2, 3), (+1, 2)]], [[(-1, 4), (-2, 5)]]],
+        ...                  [[[(+2, 3), (+2, 2)]], [[(+1, 3), (-1, 5)]]],
+        ...                  [[[(+0, 4), (+2, 3)]], [[(+2, 4), (+2, 5)]]]]
+        >>> matrices = ee.all_confusion_matrices("pcs", ["l5", "l2m"])
+        >>> matrices["l2m"].tolist()
+        [[[0, 1], [0, 0]], [[0, 1], [0, 0]], [[1, 0], [0, 0]]]
+        >>> matrices["l5"].shape
+        (3, 5, 5)
+        """
+
+        if score_types is None:
+            score_types = [score_type for score_type in score_labels_by_type
+                           if not is_random_score_type(score_type)]
+        batches = [(self.confusion_score_list_pairs(
+                        self.compute_all_scores(score_type), mode),
+                    score_labels_by_type[score_type])
+                   for score_type in score_types]
+        with self.profiler.stage("confusion"):
+            return dict(zip(score_types, confusion_matrices_batch(batches)))
+
+    def report(self, score_types, modes, num_samples=None, seed=None,
+               num_workers=1):
+        """
+        Compute the results of the given modes (see report_modes) for each of
+        the given score types, as a dictionary which can be written as JSON,
+        instead of printing them. The results of a mode are omitted for the
+        score types for which it does not work (like the printing modes, see
+        __main__), and for the confusion matrices, a score which has no label
+        is reported as an error.
+
+        The scores of each type are computed once for all modes (and the
+        intermediate types only once for all types, see compute_all_scores),
+        the Kendall tau correlations of all comparisons of all types are
+        computed in one batch (and reused by the R-tests and the noise
+        calibration), and the resamples for --bootstrap are shared by all
+        types. The jobs with many random samples run concurrently, over
+        num_workers processes. With the same seed, the results are the same
+        as those printed for each mode. The whole report is taken from the
+        result cache if possible, see cached_result (if it has modes with
+        random samples, only if a seed is given).
+
+        The profiler (see --profile) only covers the main process: with more
+        than one worker, the stages and counters of the jobs in the worker
+        processes are lost, and only their total time is recorded, as stage
+        "report sampling jobs".
+
+        >>> ee = EsaExperimentData()
+        >>> ee.all_scores = [[[[(+2, 3), (+1, 2)], [(-1, 4), (-2, 5)]],
+        ...                   [[(-1, 4), (-2, 5)], [(+1, 3), (+2, 5)]]]]
+        >>> report = ee.report(["l5", "av"], ["--kendall", "--overlap"])
+        >>> report["score_types"]["l5"]["kendall"]
+        [{'label': 'Phase 1', 'tau_a': -1.0, 'tau_b': -1.0, 'tau_p': -1.0}]
+        >>> report["score_types"]["av"]["overlap"]
+        [{'label': 'Phase 1', 'overlaps': [0.0, 1.0]}]
+        >>> ee.report(["l5"], ["--print"])
+        Traceback (most recent call last):
+        ...
+        ValueError: Mode "--print" cannot be part of a report
+        """
+
+        for mode in modes:
+            if mode not in report_modes:
+                raise ValueError("Mode \"%s\" cannot be part of a report"
+                                 % mode)
+        parameters = {"modes": modes}
+        if any(report_modes[mode] is not None for mode in modes):
+            parameters.update(num_samples=num_samples, seed=seed)
+        return self.cached_result(
+            score_types, "report", parameters,
+            lambda: self._report(score_types, modes, num_samples, seed,
+                                 num_workers))
+
+    def _report(self, score_types, modes, num_samples, seed, num_workers):
+        """
+        The computation for report.
+        """
+
+        num_phases = len(self.all_scores)
+        num_pcs = len(self.all_scores[0])
+        num_papers = len(self.all_scores[0][0])
+        comparisons = [comparison for group
+                       in pc_comparisons(num_phases, num_pcs)
+                       for comparison in group]
+        pcs_comparisons = [(label, (i1, j1), (i2, j2))
+                           for label, (i1, j1), (i2, j2) in comparisons
+                           if i1 == i2]
+        all_scores = {score_type: self.compute_all_scores(score_type)
+                      for score_type in score_types}
+        results = {score_type: {} for score_type in score_types}
+
+        def num_samples_for(mode):
+            return num_samples or report_modes[mode]
+
+        # The Kendall tau correlations of all comparisons, in one batch.
+        rtest_modes = ["--rtest-batch", "--rtest-walk", "--rtest-exact"]
+        taus = {}
+        if any(mode in modes
+               for mode in ["--kendall", "--calibrate-noise"] + rtest_modes):
+            pairs = [(score_type, label, (scores[i1][j1], scores[i2][j2]))
+                     for score_type, scores in all_scores.items()
+                     for label, (i1, j1), (i2, j2) in comparisons]
+            correlations = kendall_correlations_pairs(
+                [pair for _, _, pair in pairs], num_workers,
+                self.profiler).T.tolist()
+            for (score_type, label, _), values in zip(pairs, correlations):
+                taus[score_type, label] = values
+
+        # The jobs with many random samples, as (score type, key in results,
+        # function, arguments, function which converts the result).
+        jobs = []
+        if "--bootstrap" in modes:
+            samples = bootstrap_samples(
+                num_papers, num_samples_for("--bootstrap"), seed)
+            for score_type, scores in all_scores.items():
+                jobs.append((score_type, "bootstrap", bootstrap_intervals,
+                             (scores, samples), lambda groups: [
+                                 {"label": label, "values": values,
+                                  "intervals": intervals.T}
+                                 for group in groups
+                                 for label, _, _, values, intervals in group]))
+        if "--decision-stability" in modes:
+            for score_type, scores in all_scores.items():
+                if not is_random_score_type(score_type):
+                    jobs.append((score_type, "decision_stability",
+                                 self.decision_stability,
+                                 (scores, score_type,
+                                  num_samples_for("--decision-stability"),
+                                  seed),
+                                 lambda result: [
+                                     {"phase": i + 1, "pc": j + 1,
+                                      "flip_probabilities": probabilities,
+                                      "accepted": is_accepted}
+                                     for (i, j), probabilities, is_accepted
+                                     in zip(*result)]))
+        if "--simulate" in modes:
+            for score_type in score_types:
+                if score_type in ["avr", "l5r", "rnd"]:
+                    jobs.append((score_type, "simulate", simulate_conferences,
+                                 (num_samples_for("--simulate"), num_papers,
+                                  num_accepted, score_type, None, 0.25,
+                                  seed),
+                                 lambda result: {
+                                     name: {"mean": np.nanmean(values),
+                                            "sd": np.nanstd(values),
+                                            "percentiles": dict(zip(
+                                                [5, 25, 50, 75, 95],
+                                                np.nanpercentile(
+                                                    values, [5, 25, 50, 75,
+                                                             95])))}
+                                     for name, values in [
+                                         ("overlap", result.overlaps),
+                                         ("tau_a", result.taus[0]),
+                                         ("tau_b", result.taus[1]),
+                                         ("tau_p", result.taus[2])]}))
+        if "--calibrate-noise" in modes:
+            random_score_types = {real: simulated for simulated, real
+                                  in simulated_score_types.items()}
+            for score_type in score_types:
+                if score_type in random_score_types:
+                    jobs.append((score_type, "calibrate_noise",
+                                 calibrate_noise,
+                                 ([taus[score_type, label] for label, _, _
+                                   in pcs_comparisons], num_papers,
+                                  random_score_types[score_type],
+                                  num_samples_for("--calibrate-noise"), seed),
+                                 lambda calibrations: [
+                                     {"label": label,
+                                      "calibrations": [c._asdict()
+                                                       for c in variants]}
+                                     for (label, _, _), variants
+                                     in zip(pcs_comparisons, calibrations)]))
+        phase_pairs = sorted(itertools.combinations(range(num_phases), 2),
+                             key=lambda pair: (pair[1] - pair[0], pair[0]))
+        for mode in rtest_modes:
+            if mode not in modes:
+                continue
+            method = mode[len("--rtest-"):]
+            for score_type, scores in all_scores.items():
+                for (j1, j2), (i1, i2) in itertools.product(
+                        itertools.combinations(range(num_pcs), 2),
+                        phase_pairs):
+                    jobs.append((score_type, "rtest_" + method, rtest_p_value,
+                                 ([scores[i1][j1], scores[i1][j2]],
+                                  [scores[i2][j1], scores[i2][j2]],
+                                  num_samples_for(mode), method, seed),
+                                 lambda result, i1=i1, i2=i2, j1=j1, j2=j2: {
+                                     "phases": [i1 + 1, i2 + 1],
+                                     "pcs": [j1 + 1, j2 + 1],
+                                     "p_value": result[0],
+                                     "comment": result[1]}))
+        with self.profiler.stage("report sampling jobs"):
+            if num_workers > 1 and len(jobs) > 1:
+                with concurrent.futures.ProcessPoolExecutor(num_workers) \
+                        as executor:
+                    futures = [executor.submit(function, *args)
+                               for _, _, function, args, _ in jobs]
+                    outputs = [future.result() for future in futures]
+            else:
+                outputs = [function(*args)
+                           for _, _, function, args, _ in jobs]
+        for (score_type, key, _, _, convert), output in zip(jobs, outputs):
+            if key.startswith("rtest_"):
+                results[score_type].setdefault(key, []).append(
+                    convert(output))
+            else:
+                results[score_type][key] = convert(output)
+
+        # The cheap modes, and the correlations between the two phases of
+        # each R-test (tau b, like printed by rtest).
+        for score_type, scores in all_scores.items():
+            result = results[score_type]
+            if "--kendall" in modes:
+                result["kendall"] = [
+                    dict(zip(["label", "tau_a", "tau_b", "tau_p"],
+                             [label] + taus[score_type, label]))
+                    for label, _, _ in comparisons]
+            for mode, random_ties in [("--overlap", False),
+                                      ("--overlap-random-ties", True)]:
+                if mode in modes:
+                    with self.profiler.stage("overlap sweep"):
+                        result[mode[2:].replace("-", "_")] = [
+                            {"label": label, "overlaps": overlap_curve(
+                                scores[i1][j1], scores[i2][j2], random_ties)}
+                            for label, (i1, j1), (i2, j2) in pcs_comparisons]
+            for key in list(result):
+                if key.startswith("rtest_"):
+                    for rtest in result[key]:
+                        phase_labels = ["Phase %d" % i if num_pcs == 2 else
+                                        "Phase %d, PCs %d <-> %d"
+                                        % ((i,) + tuple(rtest["pcs"]))
+                                        for i in rtest["phases"]]
+                        rtest["taus"] = [taus[score_type, label][1]
+                                         for label in phase_labels]
+            for mode in ["--confusion-pcs", "--confusion-phases",
+                         "--confusion-phases-individual-scores"]:
+                if mode not in modes or \
+                        score_type not in score_labels_by_type:
+                    continue
+                score_labels = score_labels_by_type[score_type]
+                key = mode[2:].replace("-", "_")
+                try:
+                    with self.profiler.stage("confusion"):
+                        result[key] = {
+                            "labels": score_labels,
+                            "matrices": confusion_matrices(
+                                self.confusion_score_list_pairs(
+                                    scores, mode[len("--confusion-"):]),
+                                score_labels)}
+                except KeyError as e:
+                    result[key] = {"error": "Score %s has no label"
+                                            % e.args[0]}
+        return _json_value({
+            "num_phases": num_phases, "num_pcs": num_pcs,
+            "num_papers": num_papers, "num_accepted": num_accepted,
+            "noise_sd": score_noise_standard_deviation, "seed": seed,
+            "modes": modes, "score_types": results})
+
+    def print_confusion_matrices_helper(self, score_list_pairs, score_labels,
+                                        matrices=None):
+        """
+        Compute the confusion matrices for the given pairs of scores (unless
+        the matrices are given, then the pairs are not needed) and print them
+        side by side from left to right. Each score must be contained in
         score_labels, if formatted with %+2d
 
         >>> ee = EsaExperimentData()
@@ -713,42 +2388,161 @@ class EsaExperimentData:
         """
 
         # Compute values of confusion matrices
-        confusion_matrices = []
-        for score_list_pair in score_list_pairs:
-            confusion_matrix = {}
-            for x in score_labels:
-                confusion_matrix[x] = {}
-                for y in score_labels:
-                    confusion_matrix[x][y] = 0
-            assert len(score_list_pair[0]) == len(score_list_pair[1])
-            n = len(score_list_pair[0])
-            for i in range(n):
-                x = "%+d" % score_list_pair[0][i]
-                y = "%+d" % score_list_pair[1][i]
-                confusion_matrix[x][y] += 1
-            confusion_matrices.append(confusion_matrix)
+        if matrices is None:
+            with self.profiler.stage("confusion"):
+                matrices = confusion_matrices(score_list_pairs,
+                                              score_labels).tolist()
 
         # Print confusion matrices side by side
-        k = len(confusion_matrices)
+        k = len(matrices)
         format_string = "%2s   " + ("%2s " * len(score_labels) + "   ") * k
         color_codes_by_distance = [30, 34, 36, 31, 31]  # bold, blue, cyan, red
         print(format_string % tuple([""] + score_labels * k))
         print()
-        for x in score_labels:
+        for i, x in enumerate(score_labels):
             entries = ["%2s" % x]
-            for confusion_matrix in confusion_matrices:
-                for y in score_labels:
+            for matrix in matrices:
+                for j, y in enumerate(score_labels):
                     color = color_codes_by_distance[abs(int(x) - int(y))]
                     if self.use_ansi_colors:
                         entries.append("\x1b[%dm%2s\x1b[0m" %
-                                       (color, confusion_matrix[x][y]))
+                                       (color, matrix[i][j]))
                     else:
-                        entries.append("%2s" % confusion_matrix[x][y])
+                        entries.append("%2s" % matrix[i][j])
             print(format_string % tuple(entries))
 
 
 # Global functions
 
+def _json_value(value):
+    """
+    Convert the value to one which can be written as JSON: NumPy arrays and
+    numbers to lists and Python numbers, tuples to lists, and nan to None,
+    also inside lists and dictionaries.
+
+    >>> _json_value({"a": np.array([1.5, np.nan]), "b": (np.int64(2),)})
+    {'a': [1.5, None], 'b': [2]}
+    """
+
+    if isinstance(value, dict):
+        return {key: _json_value(x) for key, x in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_json_value(x) for x in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def score_file_names(pattern=score_file_pattern):
+    """
+    Find the score files with names matching the given pattern, where the
+    first * is the number of the phase and the second * is the number of the
+    PC. Returns a list with a list of file names for each phase, with one
+    file name for each PC, both ordered by number. Raises a ValueError if
+    there are no such files, or if a phase does not have a file for each PC.
+
+    >>> pathlib.Path("tmp/test-files").mkdir(parents=True, exist_ok=True)
+    >>> pathlib.Path("tmp/test-files/10-2.tsv").unlink(missing_ok=True)
+    >>> for name in ["1-1.tsv", "1-2.tsv", "10-1.tsv"]:
+    ...     open("tmp/test-files/" + name, "w").close()
+    >>> score_file_names("tmp/test-files/*-*.tsv")
+    Traceback (most recent call last):
+    ...
+    ValueError: Missing score file for phase 10 and PC 2
+    >>> open("tmp/test-files/10-2.tsv", "w").close()
+    >>> score_file_names("tmp/test-files/*-*.tsv")
+    ... # doctest: +NORMALIZE_WHITESPACE
+    [['tmp/test-files/1-1.tsv', 'tmp/test-files/1-2.tsv'],
+     ['tmp/test-files/10-1.tsv', 'tmp/test-files/10-2.tsv']]
+    """
+
+    parts = pattern.split("*")
+    if len(parts) != 3:
+        raise ValueError("Pattern \"%s\" must contain exactly two *"
+                         % pattern)
+    regex = re.compile(r"(\d+)".join(map(re.escape, parts)) + "$")
+    file_names = {}
+    for file_name in glob.glob(pattern):
+        match = regex.match(file_name)
+        if match:
+            file_names[tuple(map(int, match.groups()))] = file_name
+    if not file_names:
+        raise ValueError("No score files match \"%s\"" % pattern)
+    phases = sorted(set(phase for phase, _ in file_names))
+    pcs = sorted(set(pc for _, pc in file_names))
+    for phase in phases:
+        for pc in pcs:
+            if (phase, pc) not in file_names:
+                raise ValueError("Missing score file for phase %d and PC %d"
+                                 % (phase, pc))
+    return [[file_names[phase, pc] for pc in pcs] for phase in phases]
+
+
+def pc_comparisons(num_phases, num_pcs):
+    """
+    The comparisons made by print_kendall_tau and the other analyses, for
+    scores like EsaExperimentData.all_scores, with num_phases phases and
+    num_pcs PCs: first, the comparisons between each pair of PCs in each
+    phase, and then, for each pair of consecutive phases, those between the
+    phases for each PC. Returns a list of groups of comparisons (printed as
+    blocks), each a list of tuples (label, (phase, pc), (phase, pc)).
+
+    >>> pc_comparisons(2, 2) # doctest: +NORMALIZE_WHITESPACE
+    [[('Phase 1', (0, 0), (0, 1)), ('Phase 2', (1, 0), (1, 1))],
+     [('Phases 1 <-> 2, PC1', (0, 0), (1, 0)),
+      ('Phases 1 <-> 2, PC2', (0, 1), (1, 1))]]
+    >>> [label for label, _, _ in pc_comparisons(1, 3)[0]]
+    ['Phase 1, PCs 1 <-> 2', 'Phase 1, PCs 1 <-> 3', 'Phase 1, PCs 2 <-> 3']
+    """
+
+    groups = [[]]
+    for i in range(num_phases):
+        for j1, j2 in itertools.combinations(range(num_pcs), 2):
+            label = "Phase %d" % (i + 1) if num_pcs == 2 else \
+                "Phase %d, PCs %d <-> %d" % (i + 1, j1 + 1, j2 + 1)
+            groups[0].append((label, (i, j1), (i, j2)))
+    for i in range(num_phases - 1):
+        groups.append([("Phases %d <-> %d, PC%d" % (i + 1, i + 2, j + 1),
+                        (i, j), (i + 1, j)) for j in range(num_pcs)])
+    return groups
+
+
+def kendall_correlations_pairs(score_list_pairs, num_workers=1,
+                               profiler=null_profiler):
+    """
+    The Kendall tau correlations a, b, and p (see kendall_correlations_batch)
+    for each of the given pairs of score lists, as an array of shape (3,
+    number of pairs). The pair statistics take O(n log n) time for each pair
+    (see kendall_pair_statistics), and the pairs are distributed over
+    num_workers processes. The given profiler records the time of the pair
+    statistics and of each variant, and counts the pairs of papers (whose
+    comparisons the pair statistics summarize without doing them one by one).
+
+    >>> kendall_correlations_pairs([([1, 2, 3], [1, 3, 2]),
+    ...                             ([1, 2, 3], [3, 2, 1])],
+    ...                            num_workers=2).round(3).tolist()
+    [[0.333, -1.0], [0.333, -1.0], [0.333, -1.0]]
+    """
+
+    firsts = [scores1 for scores1, _ in score_list_pairs]
+    seconds = [scores2 for _, scores2 in score_list_pairs]
+    with profiler.stage("kendall pair statistics"):
+        if num_workers > 1 and len(score_list_pairs) > 1:
+            chunk_size = -(-len(score_list_pairs) // num_workers)
+            with concurrent.futures.ProcessPoolExecutor(num_workers) \
+                    as executor:
+                stats = list(executor.map(kendall_pair_statistics, firsts,
+                                          seconds, chunksize=chunk_size))
+        else:
+            stats = list(map(kendall_pair_statistics, firsts, seconds))
+    profiler.count("paper pairs", sum(
+        len(scores1) * (len(scores1) - 1) // 2 for scores1 in firsts))
+    return kendall_correlations_batch(
+        PairStatistics(*map(np.array, zip(*stats))), profiler)
+
+
 def overlap_topk(scores1, scores2, k):
     """
     Computes the overlap in the set of accepted papers, when accepting the
@@ -773,6 +2567,314 @@ def overlap_topk(scores1, scores2, k):
     return len(set1.intersection(set2)) / k
 
 
+def expected_overlap_topk(scores1, scores2, k):
+    """
+    Like overlap_topk, but when papers with the same score compete for the
+    last of the k places, each PC picks among them uniformly at random (and
+    independently of the other PC). Returns the exact expected overlap: a
+    paper in the tie group at the threshold is accepted with probability
+    (number of places left) / (size of the tie group), and the expected
+    size of the overlap is the sum over all papers of the product of their
+    acceptance probabilities for the two PCs.
+
+    >>> expected_overlap_topk([2, 1, 1, 0], [2, 1, 0, 1], 2)
+    0.625
+    >>> expected_overlap_topk([4, 3, 2, 1], [3, 1, 4, 2], 2)
+    0.5
+    """
+
+    probabilities1 = _acceptance_probabilities(scores1, k)
+    probabilities2 = _acceptance_probabilities(scores2, k)
+    return float(np.dot(probabilities1, probabilities2)) / k
+
+
+def _acceptance_probabilities(scores, k):
+    """
+    The probability of each paper to be among the top k, when ties at the
+    threshold are broken uniformly at random.
+
+    >>> _acceptance_probabilities([3, 1, 1, 1, 0], 2) * 3
+    array([3., 1., 1., 1., 0.])
+    """
+
+    scores = np.asarray(scores, dtype=float)
+    threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+    is_above = scores > threshold
+    is_tied = scores == threshold
+    num_left = k - np.count_nonzero(is_above)
+    return is_above + is_tied * (num_left / np.count_nonzero(is_tied))
+
+
+def overlap_curve(scores1, scores2, random_ties=False):
+    """
+    Computes the overlap of the top k papers, exactly like overlap_topk, but
+    for all k from 1 to n at once. Returns an array, where the entry at index
+    k - 1 is the overlap for k. Each list is sorted only once: a paper is
+    among the top k of both PCs iff the larger of its two ranks is < k.
+
+    With random_ties, compute the expected overlap like expected_overlap_topk
+    instead. For each PC, a paper is then either above the tie group at the
+    threshold, in it, or below it. The expected overlap only depends on the
+    number of papers for each combination of these for the two PCs, and
+    each of these numbers can be computed for all k at once, like above.
+
+    >>> overlap_curve([4, 3, 2, 1], [3, 1, 4, 2]).tolist() # doctest:+ELLIPSIS
+    [0.0, 0.5, 0.666..., 1.0]
+    >>> overlap_curve([1, 1, 0, 1], [1, 0, 1, 1]).tolist()[1] == \\
+    ...     overlap_topk([1, 1, 0, 1], [1, 0, 1, 1], 2)
+    True
+    >>> overlap_curve([2, 1, 1, 0], [2, 1, 0, 1], random_ties=True).tolist()
+    [1.0, 0.625, 0.6666666666666666, 1.0]
+    """
+
+    n = len(scores1)
+    if not random_ties:
+        max_ranks = np.maximum(_ranks_by_score_and_index(scores1),
+                               _ranks_by_score_and_index(scores2))
+        return np.cumsum(np.bincount(max_ranks, minlength=n)) / \
+            np.arange(1, n + 1)
+
+    # For each paper and PC, the first rank of its tie group and the first
+    # rank after it. For each k, the fraction of the tie group at the
+    # threshold which is accepted.
+    group_starts, group_ends, fractions = [], [], []
+    for scores in [scores1, scores2]:
+        group_of_rank, starts, order = _tie_groups(scores)
+        start_of_rank = starts[group_of_rank]
+        end_of_rank = starts[group_of_rank + 1]
+        group_starts.append(np.empty(n, dtype=np.int64))
+        group_starts[-1][order] = start_of_rank
+        group_ends.append(np.empty(n, dtype=np.int64))
+        group_ends[-1][order] = end_of_rank
+        fractions.append((np.arange(1, n + 1) - start_of_rank) /
+                         (end_of_rank - start_of_rank))
+
+    # For each k, the number of papers which are above the tie group at the
+    # threshold or in it, for both PCs. A paper is above it iff its group
+    # ends before rank k, and above or in it iff its group starts before.
+    def num_papers(ranks1, ranks2):
+        return np.cumsum(np.bincount(np.maximum(ranks1, ranks2),
+                                     minlength=n + 1))[:n]
+    above_above = num_papers(group_ends[0], group_ends[1])
+    above_in = num_papers(group_ends[0], group_starts[1]) - above_above
+    in_above = num_papers(group_starts[0], group_ends[1]) - above_above
+    in_in = num_papers(group_starts[0], group_starts[1]) - above_above - \
+        above_in - in_above
+    return (above_above + above_in * fractions[1] + in_above * fractions[0] +
+            in_in * fractions[0] * fractions[1]) / np.arange(1, n + 1)
+
+
+def _tie_groups(scores):
+    """
+    Sort the papers by score, descending, and group papers with the same
+    score. Returns the group of the paper at each rank, the rank where each
+    group starts (and n at the end), and the papers in rank order.
+
+    >>> [x.tolist() for x in _tie_groups([1, 3, 1, 0])]
+    [[0, 1, 1, 2], [0, 1, 3, 4], [1, 0, 2, 3]]
+    """
+
+    scores = np.asarray(scores, dtype=float)
+    order = np.argsort(-scores, kind="stable")
+    sorted_scores = scores[order]
+    is_start = np.ones(len(scores), dtype=bool)
+    is_start[1:] = sorted_scores[1:] != sorted_scores[:-1]
+    group_starts = np.append(np.flatnonzero(is_start), len(scores))
+    return np.cumsum(is_start) - 1, group_starts, order
+
+
+def _ranks_by_score_and_index(scores):
+    """
+    The rank of each paper (0 = best) when sorted by score and then by index,
+    both descending, which is how overlap_topk breaks ties.
+
+    >>> _ranks_by_score_and_index([2, 5, 2, 1]).tolist()
+    [2, 0, 1, 3]
+    """
+
+    n = len(scores)
+    order = np.lexsort((np.arange(n), scores))[::-1]
+    ranks = np.empty(n, dtype=np.int64)
+    ranks[order] = np.arange(n)
+    return ranks
+
+
+def confusion_matrices(score_list_pairs, score_labels):
+    """
+    Compute the confusion matrix for each of the given pairs of score lists.
+    Returns an array of shape (number of pairs, number of labels, number of
+    labels), where entry [i, x, y] is the number of papers with the score
+    label at index x in the first list and that at index y in the second
+    list of the i-th pair. The scores are mapped to labels like with "%+d"
+    (that is, truncated to integers).
+
+    >>> confusion_matrices([([+1, +1, +0], [-1, +1, +0]), ([0.5], [-1.5])],
+    ...                    ["+1", "+0", "-1"]).tolist()
+    [[[1, 0, 1], [0, 1, 0], [0, 0, 0]], [[0, 0, 0], [0, 0, 1], [0, 0, 0]]]
+    """
+
+    return confusion_matrices_batch([(score_list_pairs, score_labels)])[0]
+
+
+def confusion_matrices_batch(batches):
+    """
+    Like confusion_matrices, but for a list of (score list pairs, score
+    labels), for example, for several score types. Returns a list with one
+    array for each of them. All scores are mapped to the index of their label
+    once, and all matrices are counted with a single np.bincount, where each
+    matrix entry has its own code.
+
+    >>> [m.shape for m in confusion_matrices_batch(
+    ...     [([([2], [1])], ["+2", "+1"]), ([([0], [0])] * 3, ["+0"])])]
+    [(1, 2, 2), (3, 1, 1)]
+    """
+
+    codes = []
+    sizes = []
+    offset = 0
+    for score_list_pairs, score_labels in batches:
+        num_labels = len(score_labels)
+        for i, (scores1, scores2) in enumerate(score_list_pairs):
+            assert len(scores1) == len(scores2)
+            x = _score_label_indices(scores1, score_labels)
+            y = _score_label_indices(scores2, score_labels)
+            codes.append(offset + (i * num_labels + x) * num_labels + y)
+        sizes.append(len(score_list_pairs) * num_labels * num_labels)
+        offset += sizes[-1]
+    counts = np.bincount(np.concatenate(codes + [np.zeros(0, np.int64)]),
+                         minlength=offset)
+    return [matrices.reshape(-1, len(score_labels), len(score_labels))
+            for matrices, (_, score_labels) in zip(
+                np.split(counts, np.cumsum(sizes)[:-1]), batches)]
+
+
+def _score_label_indices(scores, score_labels):
+    """
+    Map each score to the index of its label (formatted with "%+d") in the
+    given list of labels. Raises a KeyError for the first score without a
+    label, like a dictionary lookup of the formatted score would.
+
+    >>> _score_label_indices([1.5, -2, 0], ["+2", "+1", "+0", "-1", "-2"])
+    array([1, 4, 2])
+    """
+
+    values = np.trunc(np.asarray(scores, dtype=float)).astype(np.int64)
+    label_values = np.array([int(label) for label in score_labels])
+    order = np.argsort(label_values)
+    positions = np.searchsorted(label_values[order], values)
+    indices = order[np.minimum(positions, len(score_labels) - 1)]
+    is_missing = label_values[indices] != values
+    if is_missing.any():
+        raise KeyError("%+d" % values[is_missing][0])
+    return indices
+
+
+# Statistics over all index pairs of two score lists: the number of concordant
+# pairs, of discordant pairs, of pairs tied only in the first list, of pairs
+# tied only in the second list, and of pairs tied in both lists.
+PairStatistics = collections.namedtuple(
+    "PairStatistics", ["nc", "nd", "nt1", "nt2", "nt12"])
+
+
+def kendall_pair_statistics(scores1, scores2):
+    """
+    Count, over all pairs i, j with j < i, the number of concordant pairs, the
+    number of discordant pairs, the number of pairs tied only in scores1, the
+    number of pairs tied only in scores2, and the number of pairs tied in both
+    (see kendall_tau_a below for the definitions), and return them as a
+    PairStatistics record. All three Kendall tau variants below can be
+    computed from this record in constant time, so when several variants are
+    needed for the same two lists, compute the record only once.
+
+    This is Knight's algorithm, which takes time O(n log n) instead of O(n^2):
+    sort the pairs (scores1[i], scores2[i]), so that pairs with equal scores1
+    are sorted by scores2. Then the discordant pairs are exactly the
+    inversions in the resulting sequence of scores2, which we count with a
+    merge sort. The tied pairs are counted from the runs of equal values in
+    the two sorted sequences.
+
+    >>> kendall_pair_statistics([1, 2, 3, 4], [2, 3, 4, 5])
+    PairStatistics(nc=6, nd=0, nt1=0, nt2=0, nt12=0)
+    >>> kendall_pair_statistics([1, 2, 3, 4], [5, 3, 3, 1])
+    PairStatistics(nc=0, nd=5, nt1=0, nt2=1, nt12=0)
+    >>> kendall_pair_statistics([1, 2, 2, 4], [5, 3, 3, 1])
+    PairStatistics(nc=0, nd=5, nt1=0, nt2=0, nt12=1)
+    >>> kendall_pair_statistics([4, 2, 3, 1], [3, 2, 2, 1])
+    PairStatistics(nc=5, nd=0, nt1=0, nt2=1, nt12=0)
+    >>> kendall_pair_statistics([1, 1, 2, 2], [1, 2, 1, 2])
+    PairStatistics(nc=1, nd=1, nt1=2, nt2=2, nt12=0)
+    """
+
+    assert len(scores1) == len(scores2)
+    n = len(scores1)
+    sorted_pairs = sorted(zip(scores1, scores2))
+    num_ties_1 = _num_tied_pairs(x for x, _ in sorted_pairs)
+    num_ties_12 = _num_tied_pairs(sorted_pairs)
+    # After this, sorted_scores2 is sorted, too.
+    sorted_scores2 = [y for _, y in sorted_pairs]
+    num_discordant_pairs = _sort_and_count_inversions(sorted_scores2)
+    num_ties_2 = _num_tied_pairs(sorted_scores2)
+    num_concordant_pairs = n * (n - 1) // 2 - num_discordant_pairs \
+        - num_ties_1 - num_ties_2 + num_ties_12
+    return PairStatistics(num_concordant_pairs, num_discordant_pairs,
+                          num_ties_1 - num_ties_12, num_ties_2 - num_ties_12,
+                          num_ties_12)
+
+
+def _num_tied_pairs(sorted_values):
+    """
+    Number of pairs of equal elements in the given sorted sequence.
+
+    >>> _num_tied_pairs([1, 1, 2, 3, 3, 3])
+    4
+    """
+
+    return sum(g * (g - 1) // 2 for g in
+               (sum(1 for _ in run) for _, run in
+                itertools.groupby(sorted_values)))
+
+
+def _sort_and_count_inversions(values):
+    """
+    Sort the given list in place with a (bottom-up) merge sort and return the
+    number of inversions, that is, the number of pairs i < j with values[i] >
+    values[j]. Equal elements do not count as an inversion.
+
+    >>> values = [3, 1, 2, 2, 0]
+    >>> _sort_and_count_inversions(values)
+    7
+    >>> values
+    [0, 1, 2, 2, 3]
+    """
+
+    n = len(values)
+    source = values
+    target = values[:]
+    num_inversions = 0
+    width = 1
+    while width < n:
+        for lo in range(0, n, 2 * width):
+            mid = min(lo + width, n)
+            hi = min(lo + 2 * width, n)
+            i, j, k = lo, mid, lo
+            while i < mid and j < hi:
+                if source[j] < source[i]:
+                    # source[j] is smaller than all of source[i:mid].
+                    target[k] = source[j]
+                    num_inversions += mid - i
+                    j += 1
+                else:
+                    target[k] = source[i]
+                    i += 1
+                k += 1
+            target[k:hi] = source[i:mid] + source[j:hi]
+        source, target = target, source
+        width *= 2
+    if source is not values:
+        values[:] = source
+    return num_inversions
+
+
 def kendall_tau_a(scores1, scores2):
     """
     Computes a distance measure based on variant A of the Kendall tau
@@ -818,22 +2920,8 @@ def kendall_tau_a(scores1, scores2):
     0.9166...
     """
 
-    num_discordant_pairs = 0
-    num_concordant_pairs = 0
-    assert len(scores1) == len(scores2)
-    n = len(scores1)
-    for i in range(n):
-        for j in range(i):
-            # Note that (x > y) - (x < y) = sign(x) in { -1, 0, +1 }
-            cmp1 = (scores1[i] > scores1[j]) - (scores1[i] < scores1[j])
-            cmp2 = (scores2[i] > scores2[j]) - (scores2[i] < scores2[j])
-            if cmp1 * cmp2 == +1:
-                num_concordant_pairs += 1
-            if cmp1 * cmp2 == -1:
-                num_discordant_pairs += 1
-    num_all_pairs = n * (n - 1) / 2
-    correlation = (num_concordant_pairs - num_discordant_pairs) / num_all_pairs
-    return (1 - correlation) / 2
+    return kendall_tau_a_from_statistics(
+        kendall_pair_statistics(scores1, scores2))
 
 
 def kendall_tau_b(scores1, scores2):
@@ -872,31 +2960,8 @@ def kendall_tau_b(scores1, scores2):
     0.8535...
     """
 
-    # Compute the number of concordant and discordant pairs, as well as, for
-    # each list, the number of index pairs without ties.
-    assert len(scores1) == len(scores2)
-    n = len(scores1)
-    num_concordant_pairs = 0
-    num_discordant_pairs = 0
-    num_index_pairs_without_ties_1 = 0
-    num_index_pairs_without_ties_2 = 0
-    for i in range(n):
-        for j in range(i):
-            # Note that (x > y) - (x < y) = sign(x) in { -1, 0, +1 }
-            cmp1 = (scores1[i] > scores1[j]) - (scores1[i] < scores1[j])
-            cmp2 = (scores2[i] > scores2[j]) - (scores2[i] < scores2[j])
-            if cmp1 * cmp2 == +1:
-                num_concordant_pairs += 1
-            if cmp1 * cmp2 == -1:
-                num_discordant_pairs += 1
-            if cmp1 != 0:
-                num_index_pairs_without_ties_1 += 1
-            if cmp2 != 0:
-                num_index_pairs_without_ties_2 += 1
-    correlation = ((num_concordant_pairs - num_discordant_pairs) /
-                   math.sqrt(num_index_pairs_without_ties_1 *
-                             num_index_pairs_without_ties_2))
-    return (1 - correlation) / 2
+    return kendall_tau_b_from_statistics(
+        kendall_pair_statistics(scores1, scores2))
 
 
 def kendall_tau_p(scores1, scores2, p=0.50):
@@ -932,57 +2997,1314 @@ def kendall_tau_p(scores1, scores2, p=0.50):
     0.08703...
     """
 
-    assert len(scores1) == len(scores2)
-    n = len(scores1)
-    num_discordant_pairs = 0.0
+    return kendall_tau_p_from_statistics(
+        kendall_pair_statistics(scores1, scores2), p)
+
+
+def kendall_tau_a_from_statistics(stats):
+    """
+    Compute the distance from function kendall_tau_a from the PairStatistics
+    record returned by kendall_pair_statistics, in constant time.
+
+    >>> stats = PairStatistics(5, 0, 0, 1, 0)
+    >>> kendall_tau_a_from_statistics(stats) # doctest:+ELLIPSIS
+    0.0833...
+    """
+
+    num_all_pairs = sum(stats)
+    correlation = (stats.nc - stats.nd) / num_all_pairs
+    return (1 - correlation) / 2
+
+
+def kendall_tau_b_from_statistics(stats):
+    """
+    Compute the distance from function kendall_tau_b from the PairStatistics
+    record returned by kendall_pair_statistics, in constant time. A pair
+    which is tied only in the second list is not tied in the first list, and
+    vice versa.
+
+    >>> stats = PairStatistics(0, 3, 0, 3, 0)
+    >>> kendall_tau_b_from_statistics(stats) # doctest:+ELLIPSIS
+    0.8535...
+    """
+
+    num_index_pairs_without_ties_1 = stats.nc + stats.nd + stats.nt2
+    num_index_pairs_without_ties_2 = stats.nc + stats.nd + stats.nt1
+    correlation = ((stats.nc - stats.nd) /
+                   math.sqrt(num_index_pairs_without_ties_1 *
+                             num_index_pairs_without_ties_2))
+    return (1 - correlation) / 2
+
+
+def kendall_tau_p_from_statistics(stats, p=0.50):
+    """
+    Compute the distance from function kendall_tau_p from the PairStatistics
+    record returned by kendall_pair_statistics, in constant time.
+
+    >>> stats = PairStatistics(5, 0, 0, 1, 0)
+    >>> kendall_tau_p_from_statistics(stats) # doctest:+ELLIPSIS
+    0.08703...
+    """
+
     # Count the number of discordant pairs, where pairs which are tied in the
     # one list and different in the other count p (default 0.5, see above).
-    num_pairs_1 = 0.0
-    num_pairs_2 = 0.0
-    for i in range(n):
-        for j in range(i):
-            # Note that (x > y) - (x < y) = sign(x) in { -1, 0, +1 }
-            cmp1 = (scores1[i] > scores1[j]) - (scores1[i] < scores1[j])
-            cmp2 = (scores2[i] > scores2[j]) - (scores2[i] < scores2[j])
-            if cmp1 * cmp2 == +1:
-                num_pairs_1 += 1
-                num_pairs_2 += 1
-            elif cmp1 * cmp2 == -1:
-                num_discordant_pairs += 1
-                num_pairs_1 += 1
-                num_pairs_2 += 1
-            elif cmp1 != 0 or cmp2 != 0:
-                num_discordant_pairs += p
-                if cmp1 == 0:
-                    # cmp1 == 0, cmp2 != 0
-                    num_pairs_1 += p
-                    num_pairs_2 += 1
-                else:
-                    # cmp1 != 0, cmp2 == 0
-                    num_pairs_1 += 1
-                    num_pairs_2 += p
-            else:
-                # cmp1 == 0, cmp2 == 0
-                num_pairs_1 += 0
-                num_pairs_2 += 0
+    # Pairs which are tied in both lists count 0 everywhere.
+    num_untied_pairs = stats.nc + stats.nd
+    num_discordant_pairs = stats.nd + p * (stats.nt1 + stats.nt2)
+    num_pairs_1 = num_untied_pairs + p * stats.nt1 + stats.nt2
+    num_pairs_2 = num_untied_pairs + stats.nt1 + p * stats.nt2
     # Return the average penalty.
     return num_discordant_pairs / math.sqrt(num_pairs_1 * num_pairs_2)
 
 
+def kendall_pair_statistics_batch(scores1, scores2):
+    """
+    Like kendall_pair_statistics, but for many pairs of score lists at once,
+    given as two arrays of shape (s, n), one pair of score lists per row. The
+    result is a PairStatistics record of five arrays of length s.
+
+    The pairwise sign tensor sign(scores[:, i] - scores[:, j]) is processed
+    one diagonal i - j = d at a time, for all rows at once. This takes time
+    O(s * n^2), but vectorized, which is much faster than s calls of
+    kendall_pair_statistics when n is small.
+
+    >>> stats = kendall_pair_statistics_batch([[1, 2, 3, 4], [1, 1, 2, 2]],
+    ...                                       [[5, 3, 3, 1], [1, 2, 1, 2]])
+    >>> [x.tolist() for x in stats]
+    [[0, 1], [5, 1], [0, 2], [1, 2], [0, 0]]
+    """
+
+    scores1 = np.asarray(scores1, dtype=float)
+    scores2 = np.asarray(scores2, dtype=float)
+    assert scores1.shape == scores2.shape
+    s, n = scores1.shape
+    # Per diagonal, the sum of the sign products is nc - nd, the number of
+    # non-zero products is nc + nd, and the number of pairs tied in a list is
+    # the number of zero signs.
+    sum_of_products = np.zeros(s, dtype=np.int64)
+    num_untied_pairs = np.zeros(s, dtype=np.int64)
+    num_untied_pairs_1 = np.zeros(s, dtype=np.int64)
+    num_untied_pairs_2 = np.zeros(s, dtype=np.int64)
+    num_pairs_untied_in_one = np.zeros(s, dtype=np.int64)
+    for d in range(1, n):
+        sign1 = _sign_of_difference(scores1[:, d:], scores1[:, :-d])
+        sign2 = _sign_of_difference(scores2[:, d:], scores2[:, :-d])
+        product = sign1 * sign2
+        sum_of_products += product.sum(axis=1, dtype=np.int64)
+        num_untied_pairs += np.count_nonzero(product, axis=1)
+        num_untied_pairs_1 += np.count_nonzero(sign1, axis=1)
+        num_untied_pairs_2 += np.count_nonzero(sign2, axis=1)
+        num_pairs_untied_in_one += np.count_nonzero(sign1 | sign2, axis=1)
+    num_pairs = n * (n - 1) // 2
+    num_concordant_pairs = (num_untied_pairs + sum_of_products) // 2
+    num_ties_12 = num_pairs - num_pairs_untied_in_one
+    return PairStatistics(num_concordant_pairs,
+                          num_untied_pairs - num_concordant_pairs,
+                          num_pairs - num_untied_pairs_1 - num_ties_12,
+                          num_pairs - num_untied_pairs_2 - num_ties_12,
+                          num_ties_12)
+
+
+def _sign_of_difference(x, y):
+    """
+    Elementwise sign of x - y as an int8 array. Like the (x > y) - (x < y) in
+    the loops above, but for arrays, and cheaper than np.sign(x - y).
+
+    >>> _sign_of_difference(np.array([1, 2, 3]), np.array([2, 2, 2])).tolist()
+    [-1, 0, 1]
+    """
+
+    return (x > y).view(np.int8) - (x < y).view(np.int8)
+
+
+def kendall_tau_b_from_statistics_batch(stats):
+    """
+    Like kendall_tau_b_from_statistics, but for a PairStatistics record of
+    arrays, as returned by kendall_pair_statistics_batch.
+
+    >>> stats = PairStatistics(*map(np.array, [[6, 0], [0, 3], [0, 0],
+    ...                                        [0, 3], [0, 0]]))
+    >>> kendall_tau_b_from_statistics_batch(stats).round(4).tolist()
+    [0.0, 0.8536]
+    """
+
+    num_index_pairs_without_ties_1 = stats.nc + stats.nd + stats.nt2
+    num_index_pairs_without_ties_2 = stats.nc + stats.nd + stats.nt1
+    correlation = ((stats.nc - stats.nd) /
+                   np.sqrt(num_index_pairs_without_ties_1.astype(float) *
+                           num_index_pairs_without_ties_2))
+    return (1 - correlation) / 2
+
+
+def kendall_tau_p_from_statistics_batch(stats, p=0.50):
+    """
+    Like kendall_tau_p_from_statistics, but for a PairStatistics record of
+    arrays. Note that kendall_tau_a_from_statistics already works for such a
+    record.
+
+    >>> stats = PairStatistics(*map(np.array, [[5, 6], [0, 0], [0, 0],
+    ...                                        [1, 0], [0, 0]]))
+    >>> kendall_tau_p_from_statistics_batch(stats).round(4).tolist()
+    [0.087, 0.0]
+    """
+
+    num_untied_pairs = stats.nc + stats.nd
+    num_discordant_pairs = stats.nd + p * (stats.nt1 + stats.nt2)
+    num_pairs_1 = num_untied_pairs + p * stats.nt1 + stats.nt2
+    num_pairs_2 = num_untied_pairs + stats.nt1 + p * stats.nt2
+    return num_discordant_pairs / np.sqrt(num_pairs_1 * num_pairs_2)
+
+
+def rtest_p_value_batch(scores_1, scores_2, num_samples, seed=None,
+                        num_workers=1, alpha=None, block_size=4096):
+    """
+    Compute the p-value of the R-test from EsaExperimentData.rtest for two
+    phases, where scores_1 and scores_2 are the pairs (scores of PC1, scores
+    of PC2) for the two phases, and the ranking similarity is the Kendall tau
+    b correlation between the two PCs. Returns the p-value and the number of
+    samples it is based on.
+
+    For each sample, each paper is swapped between the two phases with
+    probability 1/2. The samples are processed in blocks, see function
+    _rtest_count_block below. Each block has its own random generator, which
+    is spawned from the given seed, and blocks are evaluated in order. The
+    result for a given seed is therefore exactly the same, no matter how
+    many worker processes the blocks are distributed over.
+
+    If alpha is given, we stop after the first block for which the p-value is
+    clearly above or below alpha, see function _p_value_is_decided below.
+
+    >>> scores_1 = ([1, 2, 3, 4, 5, 6], [1, 2, 3, 4, 5, 6])
+    >>> rtest_p_value_batch(scores_1, scores_1, 100)
+    (1.0, 100)
+    >>> scores_2 = ([1, 2, 3, 4, 5, 6], [6, 5, 4, 3, 2, 1])
+    >>> p, _ = rtest_p_value_batch(scores_1, scores_2, 1000, seed=7,
+    ...                            block_size=100)
+    >>> p == rtest_p_value_batch(scores_1, scores_2, 1000, seed=7,
+    ...                          num_workers=3, block_size=100)[0]
+    True
+    >>> p < 0.1
+    True
+    >>> p, num_samples_used = rtest_p_value_batch(
+    ...     scores_1, scores_2, 10 ** 6, seed=7, alpha=0.05, block_size=1000)
+    >>> p < 0.05 and num_samples_used < 10 ** 6
+    True
+    """
+
+    scores_1 = tuple(np.asarray(x, dtype=float) for x in scores_1)
+    scores_2 = tuple(np.asarray(x, dtype=float) for x in scores_2)
+    n = len(scores_1[0])
+    diff_observed = _rtest_differences(
+        scores_1, scores_2, np.ones((1, n), dtype=bool))[0]
+    block_sizes = [min(block_size, num_samples - start)
+                   for start in range(0, num_samples, block_size)]
+    block_seeds = np.random.SeedSequence(seed).spawn(len(block_sizes))
+    block_args = [(scores_1, scores_2, diff_observed, block_seed, size)
+                  for block_seed, size in zip(block_seeds, block_sizes)]
+
+    # Without early stopping, process all blocks at once, otherwise in waves
+    # of one block per worker.
+    wave_size = len(block_args) if alpha is None else num_workers
+    executor = concurrent.futures.ProcessPoolExecutor(num_workers) \
+        if num_workers > 1 else None
+    count = 0
+    num_samples_used = 0
+    try:
+        for wave_start in range(0, len(block_args), wave_size):
+            wave = block_args[wave_start:wave_start + wave_size]
+            counts = executor.map(_rtest_count_block, *zip(*wave)) \
+                if executor else map(_rtest_count_block, *zip(*wave))
+            for block_count, args in zip(counts, wave):
+                count += block_count
+                num_samples_used += args[-1]
+                if alpha is not None and \
+                        _p_value_is_decided(count, num_samples_used, alpha):
+                    return count / num_samples_used, num_samples_used
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+    return count / num_samples_used, num_samples_used
+
+
+def _rtest_count_block(scores_1, scores_2, diff_observed, block_seed, size):
+    """
+    Draw one block of R-test samples and count those for which the absolute
+    difference in ranking similarity is at least the observed one. The swap
+    mask for the whole block is drawn as one boolean matrix of shape (size,
+    #papers), and the score matrices are built from it with np.where.
+
+    >>> scores = (np.array([1., 2., 3.]), np.array([1., 2., 3.]))
+    >>> _rtest_count_block(scores, scores, 0.0, np.random.SeedSequence(1), 5)
+    5
+    """
+
+    rng = np.random.default_rng(block_seed)
+    mask = rng.integers(2, size=(size, len(scores_1[0])), dtype=bool)
+    differences = _rtest_differences(scores_1, scores_2, mask)
+    return int(np.count_nonzero(np.abs(differences) >= abs(diff_observed)))
+
+
+def _rtest_differences(scores_1, scores_2, mask):
+    """
+    For each row of the given swap mask, compute the difference between the
+    Kendall tau b correlation of the two PCs for configuration A (the scores
+    from phase 1 where the mask is True and from phase 2 otherwise) and for
+    configuration B (the other way round). The observed difference is
+    computed with this function, too, so that a sample which happens to
+    reproduce it is guaranteed to count.
+
+    >>> scores_1 = (np.array([1., 2., 3.]), np.array([1., 2., 3.]))
+    >>> scores_2 = (np.array([1., 2., 3.]), np.array([3., 2., 1.]))
+    >>> _rtest_differences(scores_1, scores_2,
+    ...                    np.array([[True] * 3, [False] * 3])).tolist()
+    [2.0, -2.0]
+    """
+
+    scores_A_pc1 = np.where(mask, scores_1[0], scores_2[0])
+    scores_A_pc2 = np.where(mask, scores_1[1], scores_2[1])
+    scores_B_pc1 = np.where(mask, scores_2[0], scores_1[0])
+    scores_B_pc2 = np.where(mask, scores_2[1], scores_1[1])
+    tau_A = 1 - 2 * kendall_tau_b_from_statistics_batch(
+        kendall_pair_statistics_batch(scores_A_pc1, scores_A_pc2))
+    tau_B = 1 - 2 * kendall_tau_b_from_statistics_batch(
+        kendall_pair_statistics_batch(scores_B_pc1, scores_B_pc2))
+    return tau_A - tau_B
+
+
+def _p_value_is_decided(count, num_samples, alpha, z=3.29):
+    """
+    Sequential stopping rule for the R-test: check whether the Wilson score
+    interval for a p-value estimated as count / num_samples lies completely
+    above or below alpha. The default z = 3.29 corresponds to a confidence
+    level of 99.9 percent, which keeps the probability of a wrong decision
+    small, even though we check after every block.
+
+    >>> _p_value_is_decided(10, 1000, 0.05)
+    True
+    >>> _p_value_is_decided(40, 1000, 0.05)
+    False
+    >>> _p_value_is_decided(200, 1000, 0.05)
+    True
+    """
+
+    p = count / num_samples
+    center = (p + z * z / (2 * num_samples)) / (1 + z * z / num_samples)
+    radius = z / (1 + z * z / num_samples) * math.sqrt(
+        p * (1 - p) / num_samples + z * z / (4 * num_samples * num_samples))
+    return alpha < center - radius or alpha > center + radius
+
+
+# The random score types which can be simulated by simulate_noisy_scores, and
+# the score type computed from the real data, which each of them models.
+simulated_score_types = {"avr": "av", "l5r": "l5", "l3r": "l3m", "l2r": "l2m"}
+
+# Result of calibrate_noise for one phase and one variant of Kendall tau: the
+# observed correlation, the noise standard deviation for which the mean of the
+# simulated correlations is the same, and the range of standard deviations for
+# which the observed correlation is within the central 95% of the simulated
+# ones. A value is nan if the grid of standard deviations does not reach it.
+NoiseCalibration = collections.namedtuple(
+    "NoiseCalibration", ["observed", "sigma", "sigma_low", "sigma_high"])
+
+
+def simulate_noisy_scores(num_papers, sigmas, num_simulations,
+                          score_type="avr", seed=None):
+    """
+    Simulate num_simulations pairs of score lists of the given random score
+    type (see simulated_score_types) for each of the given noise standard
+    deviations, like compute_scores does for a single list, but all at once
+    with NumPy. The same Gaussian noise (scaled by the standard deviation) is
+    used for each standard deviation, so that the results change smoothly
+    with it. Returns two arrays of shape (len(sigmas), num_simulations,
+    num_papers), one for each PC.
+
+    >>> scores1, scores2 = simulate_noisy_scores(5, [0.0, 0.5], 3, "l5r", 1)
+    >>> scores1.shape, scores1[0, 0].tolist()
+    ((2, 3, 5), [2.0, 1.0, 0.0, -1.0, -2.0])
+    """
+
+    rng = np.random.default_rng(seed)
+    noise = rng.standard_normal((2, 1, num_simulations, num_papers))
+    sigmas = np.asarray(sigmas, dtype=float)[:, None, None]
+    fixed_scores = 2 - 4 * np.arange(num_papers) / (num_papers - 1)
+    scores = np.clip(fixed_scores + sigmas * noise, -2, 2)
+    if score_type != "avr":
+        scores = np.round(scores)
+    if score_type in ["l3r", "l2r"]:
+        score_map = l5_to_l3m_map if score_type == "l3r" else l5_to_l2m_map
+        lookup_table = np.array([score_map[x] for x in range(-2, 3)],
+                                dtype=float)
+        scores = lookup_table[scores.astype(int) + 2]
+    return scores[0], scores[1]
+
+
+def simulated_kendall_taus(num_papers, sigmas, num_simulations,
+                           score_type="avr", seed=None):
+    """
+    The Kendall tau correlations (a, b, and p, like in print_kendall_tau)
+    between the two PCs for pairs of score lists simulated with
+    simulate_noisy_scores. Returns an array of shape (3, len(sigmas),
+    num_simulations).
+
+    >>> taus = simulated_kendall_taus(20, [0.0, 1.0, 100.0], 200, seed=1)
+    >>> taus.mean(axis=2).round(2).tolist()
+    [[1.0, 0.44, -0.01], [1.0, 0.45, -0.01], [1.0, 0.44, -0.2]]
+    """
+
+    scores1, scores2 = simulate_noisy_scores(num_papers, sigmas,
+                                             num_simulations, score_type, seed)
+    stats = kendall_pair_statistics_batch(
+        scores1.reshape(-1, num_papers), scores2.reshape(-1, num_papers))
+    return kendall_correlations_batch(stats).reshape(
+        3, len(sigmas), num_simulations)
+
+
+def kendall_correlations_batch(stats, profiler=null_profiler):
+    """
+    The Kendall tau correlations a, b, and p (that is, 1 - 2 * distance, like
+    in print_kendall_tau) for a PairStatistics record of arrays, as an array
+    of shape (3, number of pairs). A correlation which is not defined (for
+    example, tau b, if all scores in a list are the same) is nan. The given
+    profiler records the time of each variant.
+
+    >>> stats = PairStatistics(*map(np.array, [[6, 0], [0, 0], [0, 6],
+    ...                                        [0, 0], [0, 0]]))
+    >>> kendall_correlations_batch(stats).round(3).tolist()
+    [[1.0, 0.0], [1.0, nan], [1.0, -0.414]]
+    """
+
+    distances = []
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for variant, from_statistics in [
+                ("a", kendall_tau_a_from_statistics),
+                ("b", kendall_tau_b_from_statistics_batch),
+                ("p", kendall_tau_p_from_statistics_batch)]:
+            with profiler.stage("kendall tau " + variant):
+                distances.append(from_statistics(stats))
+    return 1 - 2 * np.array(distances)
+
+
+def calibrate_noise(observed_taus, num_papers, score_type="avr",
+                    num_simulations=2000, seed=None,
+                    sigmas=np.linspace(0.1, 3.0, 30), tolerance=0.001):
+    """
+    Find the noise standard deviation for which the simulated scores of the
+    given random score type have the observed Kendall tau correlations, see
+    NoiseCalibration. The observed_taus are a list with one list (a, b, p)
+    for each pair of score lists (for example, for each phase).
+
+    The mean correlation decreases with the standard deviation. It is first
+    computed on the given grid (once for all pairs), and the standard
+    deviation is then narrowed down by bisection in the grid interval where
+    it crosses the observed correlation, with the same noise (also without a
+    seed, one is drawn for both). Returns a list with a NoiseCalibration for
+    each of a, b, and p, for each pair.
+
+    >>> calibrations = calibrate_noise([[0.5, 0.5, 0.5]], 30, seed=1)[0]
+    >>> [round(c.sigma, 1) for c in calibrations]
+    [0.8, 0.9, 0.8]
+    >>> all(c.sigma_low < c.sigma < c.sigma_high for c in calibrations)
+    True
+    """
+
+    seed = np.random.SeedSequence(seed).entropy
+    sigmas = np.asarray(sigmas, dtype=float)
+    taus = simulated_kendall_taus(num_papers, sigmas, num_simulations,
+                                  score_type, seed)
+    means = np.nanmean(taus, axis=2)
+    lower_bounds, upper_bounds = np.nanpercentile(taus, [2.5, 97.5], axis=2)
+
+    def crossing(curve, observed):
+        # Sigma where the (decreasing) curve crosses the observed value, by
+        # linear interpolation, or nan if it does not cross it.
+        curve = np.minimum.accumulate(curve)
+        if not curve[-1] <= observed <= curve[0]:
+            return math.nan
+        return float(np.interp(-observed, -curve, sigmas))
+
+    def mean_tau(variant, sigma):
+        # Like simulated_kendall_taus, but only for the given variant.
+        scores1, scores2 = simulate_noisy_scores(
+            num_papers, [sigma], num_simulations, score_type, seed)
+        stats = kendall_pair_statistics_batch(scores1[0], scores2[0])
+        from_statistics = [kendall_tau_a_from_statistics,
+                           kendall_tau_b_from_statistics_batch,
+                           kendall_tau_p_from_statistics_batch][variant]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.nanmean(1 - 2 * from_statistics(stats))
+
+    all_calibrations = []
+    for taus in observed_taus:
+        calibrations = []
+        for variant, observed in enumerate(taus):
+            sigma = crossing(means[variant], observed)
+            if not math.isnan(sigma):
+                i = np.searchsorted(sigmas, sigma)
+                low = sigmas[max(i - 1, 0)]
+                high = sigmas[min(i, len(sigmas) - 1)]
+                while high - low > tolerance:
+                    middle = (low + high) / 2
+                    if mean_tau(variant, middle) > observed:
+                        low = middle
+                    else:
+                        high = middle
+                sigma = float((low + high) / 2)
+            calibrations.append(NoiseCalibration(
+                observed, sigma, crossing(lower_bounds[variant], observed),
+                crossing(upper_bounds[variant], observed)))
+        all_calibrations.append(calibrations)
+    return all_calibrations
+
+
+# Result of simulate_conferences: the overlap of the sets of accepted papers
+# of the two PCs, and the Kendall tau correlations (a, b, p) between the
+# scores of the two PCs, as arrays with one entry for each conference (taus
+# has shape (3, number of conferences)).
+ConferenceSimulation = collections.namedtuple(
+    "ConferenceSimulation", ["overlaps", "taus"])
+
+
+def simulate_conferences(num_conferences, num_papers=51,
+                         num_accepted=num_accepted, score_type="avr",
+                         noise_sd=None, fraction_four_reviews=0.25, seed=None,
+                         num_workers=1, block_size=1000):
+    """
+    Simulate conferences with two PCs, which review the same num_papers
+    papers and each accept num_accepted of them. Each paper has a fixed
+    quality, evenly spaced from +2 to -2 like for avr. In each PC, it gets
+    three reviews (or four, with probability fraction_four_reviews), each of
+    which is its quality plus Gaussian noise. The standard deviation of the
+    noise of a review is noise_sd (default: score_noise_standard_deviation)
+    times the square root of the number of reviews, so that the average of
+    the reviews has noise_sd, like the single score of compute_scores for
+    avr. The score of a paper is that average truncated to [-2..2] for score
+    type avr, rounded to an integer for l5r, and random from [-2..2] for rnd.
+    Ties at the acceptance threshold are broken at random.
+
+    The conferences are simulated in blocks of block_size, vectorized with
+    NumPy, each block with its own random generator spawned from the seed.
+    The blocks can be distributed over num_workers processes, and the result
+    for a given seed does not depend on num_workers. Returns a
+    ConferenceSimulation.
+
+    >>> result = simulate_conferences(1000, 20, 5, noise_sd=0.0, seed=1)
+    >>> set(result.overlaps.tolist()), set(result.taus.ravel().tolist())
+    ({1.0}, {1.0})
+    >>> result = simulate_conferences(1000, 20, 5, "rnd", seed=1,
+    ...                               block_size=300)
+    >>> abs(float(result.overlaps.mean()) - 5 / 20) < 0.01
+    True
+    >>> np.array_equal(result.taus, simulate_conferences(
+    ...     1000, 20, 5, "rnd", seed=1, num_workers=2, block_size=300).taus)
+    True
+
+    The mean overlap for avr is that of single noisy scores like those of
+    compute_scores:
+
+    >>> rng = np.random.default_rng(2)
+    >>> quality = 2 - 4 * np.arange(51) / 50
+    >>> scores = np.clip(quality + score_noise_standard_deviation *
+    ...                  rng.standard_normal((2, 10000, 51)), -2, 2)
+    >>> is_accepted = _top_k_mask(scores, 12, rng.random(scores.shape))
+    >>> single_overlap = np.count_nonzero(
+    ...     is_accepted[0] & is_accepted[1], axis=1).mean() / 12
+    >>> result = simulate_conferences(10000, 51, 12, seed=1)
+    >>> bool(abs(result.overlaps.mean() - single_overlap) < 0.01)
+    True
+    """
+
+    if noise_sd is None:
+        noise_sd = score_noise_standard_deviation
+    block_sizes = [min(block_size, num_conferences - start)
+                   for start in range(0, num_conferences, block_size)]
+    block_seeds = np.random.SeedSequence(seed).spawn(len(block_sizes))
+    block_args = [(size, num_papers, num_accepted, score_type, noise_sd,
+                   fraction_four_reviews, block_seed)
+                  for block_seed, size in zip(block_seeds, block_sizes)]
+    if num_workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(num_workers) as executor:
+            results = list(executor.map(_simulate_conference_block,
+                                        *zip(*block_args)))
+    else:
+        results = list(map(_simulate_conference_block, *zip(*block_args)))
+    return ConferenceSimulation(
+        np.concatenate([overlaps for overlaps, _ in results]),
+        np.concatenate([taus for _, taus in results], axis=1))
+
+
+def _simulate_conference_block(num_conferences, num_papers, num_accepted,
+                               score_type, noise_sd, fraction_four_reviews,
+                               block_seed):
+    """
+    Simulate one block of conferences for simulate_conferences and return
+    the overlaps and the Kendall tau correlations.
+    """
+
+    rng = np.random.default_rng(block_seed)
+    shape = (2, num_conferences, num_papers)
+    if score_type == "rnd":
+        scores = rng.random(shape) * 4 - 2
+    else:
+        quality = 2 - 4 * np.arange(num_papers) / (num_papers - 1)
+        has_fourth_review = rng.random(shape) < fraction_four_reviews
+        num_reviews = 3 + has_fourth_review
+        # The average of the reviews, each with noise of standard deviation
+        # noise_sd * sqrt(number of reviews).
+        noise = rng.standard_normal(shape + (4,))
+        noise[..., 3] *= has_fourth_review
+        scores = np.clip(quality + noise_sd * noise.sum(axis=-1) /
+                         np.sqrt(num_reviews), -2, 2)
+        if score_type == "l5r":
+            scores = np.round(scores)
+
+    # Break ties at the acceptance threshold with a random key.
+    is_accepted = _top_k_mask(scores, num_accepted, rng.random(shape))
+    overlaps = np.count_nonzero(is_accepted[0] & is_accepted[1], axis=1) \
+        / num_accepted
+    return overlaps, kendall_correlations_rows(scores[0], scores[1])
+
+
+def kendall_correlations_rows(scores1, scores2):
+    """
+    The Kendall tau correlations a, b, and p (see kendall_correlations_batch)
+    between each row of scores1 and the same row of scores2, as an array of
+    shape (3, number of rows).
+
+    >>> kendall_correlations_rows(np.array([[1, 2, 3]]),
+    ...                           np.array([[1, 3, 2]])).round(3).tolist()
+    [[0.333], [0.333], [0.333]]
+    """
+
+    # For many papers, the O(n^2) batch computation is slower than one
+    # O(n log n) computation per row.
+    if scores1.shape[1] <= 200:
+        stats = kendall_pair_statistics_batch(scores1, scores2)
+    else:
+        stats = PairStatistics(*map(np.array, zip(*[
+            kendall_pair_statistics(row1, row2) for row1, row2
+            in zip(scores1.tolist(), scores2.tolist())])))
+    return kendall_correlations_batch(stats)
+
+
+def _top_k_mask(scores, k, tie_keys):
+    """
+    Boolean mask of the k top-ranked papers in each row of scores, sorted by
+    score (descending) and then by tie_keys (ascending).
+
+    >>> _top_k_mask(np.array([[1, 2, 2, 0]]), 2,
+    ...             np.array([[0, 1, 0, 0]])).tolist()
+    [[False, True, True, False]]
+    >>> _top_k_mask(np.array([[2, 2, 2, 0]]), 2,
+    ...             np.array([[0, 1, 2, 0]])).tolist()
+    [[True, True, False, False]]
+    """
+
+    order = np.lexsort((tie_keys, -scores))
+    is_top = np.zeros(np.shape(scores), dtype=bool)
+    np.put_along_axis(is_top, order[..., :k], True, axis=-1)
+    return is_top
+
+
+def decision_flip_probabilities(scores, resampled_scores, k=num_accepted):
+    """
+    Whether each paper is among the top k for the given scores (ties broken
+    like in overlap_topk), and the fraction of the resampled scores (one row
+    per resample, see EsaExperimentData.resampled_scores) for which this
+    decision is different.
+
+    >>> probabilities, is_accepted = decision_flip_probabilities(
+    ...     [2, 1, 0], [[2, 1, 0], [2, 0, 1], [0, 1, 2], [2, 1, 1]], 2)
+    >>> probabilities.tolist(), is_accepted.tolist()
+    ([0.25, 0.5, 0.75], [True, True, False])
+    """
+
+    resampled_scores = np.asarray(resampled_scores, dtype=float)
+    tie_keys = -np.arange(resampled_scores.shape[1])
+    is_accepted = _top_k_mask(np.asarray(scores, dtype=float), k, tie_keys)
+    is_accepted_resampled = _top_k_mask(
+        resampled_scores, k, np.broadcast_to(tie_keys, resampled_scores.shape))
+    return (np.mean(is_accepted_resampled != is_accepted, axis=0),
+            is_accepted)
+
+
+def bootstrap_samples(num_papers, num_samples, seed=None):
+    """
+    Draw num_samples resamples of the papers, with replacement, as an array
+    of shape (num_samples, num_papers) of paper indices. The same resamples
+    are meant to be used for all statistics, see bootstrap_statistics.
+
+    >>> samples = bootstrap_samples(5, 1000, seed=1)
+    >>> samples.shape, int(samples.min()), int(samples.max())
+    ((1000, 5), 0, 4)
+    """
+
+    return np.random.default_rng(seed).integers(
+        0, num_papers, (num_samples, num_papers))
+
+
+def bootstrap_intervals(scores, samples, confidence=0.95, k=num_accepted):
+    """
+    For each of the comparisons from pc_comparisons, for scores like
+    EsaExperimentData.all_scores, the Kendall tau correlations (a, b, p) and
+    the overlap of the top k papers, for the given resamples (see
+    bootstrap_samples) and for the real scores. Returns the groups from
+    pc_comparisons, with the values for the real scores (an array of length
+    4) and the percentile intervals (shape (2, 4)) added to each comparison.
+
+    >>> scores = [[[3, 2, 1, 0], [3, 2, 1, 0]]]
+    >>> samples = bootstrap_samples(4, 100, seed=1)
+    >>> [(label, values.tolist(), intervals[:, 1:].tolist())
+    ...  for label, _, _, values, intervals
+    ...  in bootstrap_intervals(scores, samples, k=2)[0]]
+    [('Phase 1', [1.0, 1.0, 1.0, 1.0], [[1.0, 1.0, 1.0], [1.0, 1.0, 1.0]])]
+    """
+
+    identity = np.arange(len(scores[0][0]))[None, :]
+    percentiles = [50 - 50 * confidence, 50 + 50 * confidence]
+    groups = []
+    for group in pc_comparisons(len(scores), len(scores[0])):
+        groups.append([])
+        for label, (i1, j1), (i2, j2) in group:
+            estimate = bootstrap_statistics(scores[i1][j1], scores[i2][j2],
+                                            identity, k)
+            result = bootstrap_statistics(scores[i1][j1], scores[i2][j2],
+                                          samples, k)
+            values = np.concatenate([estimate.taus, [estimate.overlaps]])
+            intervals = np.nanpercentile(np.concatenate(
+                [result.taus, [result.overlaps]]), percentiles, axis=1)
+            groups[-1].append((label, (i1, j1), (i2, j2), values[:, 0],
+                               intervals))
+    return groups
+
+
+# Result of bootstrap_statistics: the Kendall tau correlations (a, b, p), as
+# an array of shape (3, number of resamples), and the overlap of the top k
+# papers, with one entry for each resample.
+BootstrapStatistics = collections.namedtuple(
+    "BootstrapStatistics", ["taus", "overlaps"])
+
+
+def bootstrap_statistics(scores1, scores2, samples, k=num_accepted):
+    """
+    The Kendall tau correlations and the overlap of the top k papers between
+    the two score lists, for each resample of the papers (a row of paper
+    indices, see bootstrap_samples), all at once. A paper drawn more than
+    once is tied with its copies in both lists. Ties at the acceptance
+    threshold are broken like in overlap_topk, by the paper index.
+
+    >>> result = bootstrap_statistics([4, 3, 2, 1], [3, 1, 4, 2],
+    ...                               [[0, 1, 2, 3], [0, 0, 2, 2]], 2)
+    >>> result.overlaps.tolist(), result.taus.round(3).tolist()
+    ([0.5, 0.0], [[0.0, -0.667], [0.0, -1.0], [0.0, -1.0]])
+    >>> float(result.overlaps[0]) == overlap_topk([4, 3, 2, 1],
+    ...                                           [3, 1, 4, 2], 2)
+    True
+    """
+
+    samples = np.asarray(samples)
+    scores1 = np.asarray(scores1, dtype=float)[samples]
+    scores2 = np.asarray(scores2, dtype=float)[samples]
+    tie_keys = -(samples * samples.shape[1] + np.arange(samples.shape[1]))
+    overlaps = np.count_nonzero(_top_k_mask(scores1, k, tie_keys) &
+                                _top_k_mask(scores2, k, tie_keys), axis=1) / k
+    return BootstrapStatistics(kendall_correlations_rows(scores1, scores2),
+                               overlaps)
+
+
+def rtest_p_value(scores_1, scores_2, num_samples, method="batch", seed=None):
+    """
+    The p-value of the R-test between scores_1 and scores_2 (each a pair of
+    score lists, one for each PC) for one of the methods batch, walk, or
+    exact from EsaExperimentData.rtest, together with a comment on how it
+    was computed.
+
+    >>> scores_1 = [[4, 3, 2, 1], [4, 3, 2, 1]]
+    >>> scores_2 = [[4, 3, 2, 1], [4, 3, 1, 2]]
+    >>> rtest_p_value(scores_1, scores_2, 100, "exact")
+    (0.5, 'exact, 2 papers')
+    """
+
+    if method == "batch":
+        p_value, num_samples_used = rtest_p_value_batch(
+            scores_1, scores_2, num_samples, seed=seed)
+        return p_value, "batch, %d samples" % num_samples_used
+    rt = IncrementalRTest(scores_1, scores_2)
+    if method == "exact" and len(rt.papers) <= rt.max_exact_papers:
+        return rt.exact_p_value(), "exact, %d papers" % len(rt.papers)
+    return (rt.random_walk_p_value(num_samples, seed),
+            "random walk, %d papers" % len(rt.papers))
+
+
+class IncrementalRTest:
+    """
+    Incremental engine for the R-test from EsaExperimentData.rtest, for two
+    phases with score pairs scores_1 and scores_2 (scores of PC1, scores of
+    PC2). It maintains the pair statistics of the two configurations A and B
+    for the current swap mask. Swapping a single paper k between the two
+    phases only changes the pairs involving k, so the statistics can be
+    updated in time O(n) instead of O(n log n) or O(n^2), see method flip.
+
+    Swapping a paper with the same scores in both phases changes nothing, so
+    only the other papers are considered for swapping. Swapping all of them
+    just exchanges A and B, so it suffices to enumerate half of the masks for
+    the exact p-value. For a small number of such papers, this is feasible
+    when the masks are enumerated in Gray code order, where consecutive masks
+    differ in exactly one paper, see method exact_p_value. Otherwise, see
+    method random_walk_p_value.
+
+    >>> scores_1 = ([1, 2, 3, 4, 5, 6], [1, 2, 3, 4, 5, 6])
+    >>> scores_2 = ([1, 2, 3, 4, 5, 6], [1, 3, 2, 4, 6, 5])
+    >>> rt = IncrementalRTest(scores_1, scores_2)
+    >>> rt.papers
+    [1, 2, 4, 5]
+    >>> rt.exact_p_value()
+    0.125
+    """
+
+    # The default maximal number of papers for exact_p_value: the 2^14 flips
+    # take about a second for 51 papers.
+    max_exact_papers = 15
+
+    def __init__(self, scores_1, scores_2, papers=None):
+        """
+        Start with the unswapped configuration, where A has the scores from
+        the first phase and B has the scores from the second phase. If papers
+        is given, only these papers are considered for swapping.
+        """
+
+        self.scores_1 = [np.asarray(x, dtype=float) for x in scores_1]
+        self.scores_2 = [np.asarray(x, dtype=float) for x in scores_2]
+        n = len(self.scores_1[0])
+        if papers is None:
+            papers = [k for k in range(n)
+                      if self.scores_1[0][k] != self.scores_2[0][k]
+                      or self.scores_1[1][k] != self.scores_2[1][k]]
+        self.papers = papers
+        self.swapped = np.zeros(n, dtype=bool)
+        # The current scores, indexed by configuration (A, B), PC, paper, and
+        # the current pair statistics, indexed by configuration.
+        self.scores = np.array([self.scores_1, self.scores_2])
+        self.stats = np.array([kendall_pair_statistics(*self.scores[0]),
+                               kendall_pair_statistics(*self.scores[1])])
+        self.scores_A, self.scores_B = self.scores
+        self.stats_A, self.stats_B = self.stats
+        self.diff_observed = self.difference()
+
+    def flip(self, k):
+        """
+        Swap paper k between the two phases and update the pair statistics.
+
+        >>> rt = IncrementalRTest(([1, 2, 3], [1, 2, 3]), ([1, 2, 3],
+        ...                                                [3, 2, 1]))
+        >>> rt.flip(0)
+        >>> rt.stats_A.tolist() == list(kendall_pair_statistics(
+        ...     [1, 2, 3], [3, 2, 3]))
+        True
+        """
+
+        self.stats -= _paper_pair_statistics(self.scores, k)
+        self.swapped[k] = not self.swapped[k]
+        new_A, new_B = (self.scores_2, self.scores_1) if self.swapped[k] \
+            else (self.scores_1, self.scores_2)
+        self.scores[0, :, k] = new_A[0][k], new_A[1][k]
+        self.scores[1, :, k] = new_B[0][k], new_B[1][k]
+        self.stats += _paper_pair_statistics(self.scores, k)
+
+    def difference(self):
+        """
+        The difference in the Kendall tau b correlation between the two PCs
+        for configuration A and configuration B, in constant time.
+        """
+
+        tau_A = 1 - 2 * kendall_tau_b_from_statistics(
+            PairStatistics(*self.stats_A.tolist()))
+        tau_B = 1 - 2 * kendall_tau_b_from_statistics(
+            PairStatistics(*self.stats_B.tolist()))
+        return tau_A - tau_B
+
+    def exact_p_value(self, max_papers=max_exact_papers):
+        """
+        Compute the exact p-value by enumerating all swap masks of the
+        considered papers but the last in Gray code order. Raises a
+        ValueError if there are more than max_papers such papers.
+
+        >>> IncrementalRTest(([1, 2, 3], [1, 2, 3]),
+        ...                  ([1, 2, 3], [1, 2, 3])).exact_p_value()
+        1.0
+        """
+
+        m = len(self.papers) - 1
+        if m > max_papers - 1:
+            raise ValueError("Exact R-test for %d papers is infeasible, the "
+                             "maximum is %d" % (m + 1, max_papers))
+        if m < 0:
+            return 1.0
+        count = int(self._counts())
+        for i in range(1, 2 ** m):
+            # The bit which changes between the Gray codes of i - 1 and i.
+            self.flip(self.papers[(i & -i).bit_length() - 1])
+            count += self._counts()
+        return count / 2 ** m
+
+    def random_walk_p_value(self, num_samples, seed=None):
+        """
+        Estimate the p-value from num_samples swap masks, which are visited
+        by a random walk: start with a uniformly random mask, and then swap
+        one uniformly random paper per step. The masks are uniformly
+        distributed, but consecutive ones are dependent, so this needs more
+        samples than rtest_p_value_batch for the same accuracy (at a much
+        lower cost per sample).
+
+        >>> rt = IncrementalRTest(([1, 2, 3, 4, 5, 6], [1, 2, 3, 4, 5, 6]),
+        ...                       ([1, 2, 3, 4, 5, 6], [1, 3, 2, 4, 6, 5]))
+        >>> abs(rt.random_walk_p_value(10000, seed=1) - 0.125) < 0.03
+        True
+        """
+
+        rng = np.random.default_rng(seed)
+        if len(self.papers) == 0:
+            return 1.0
+        for k in self.papers:
+            if rng.integers(2) == 1:
+                self.flip(k)
+        count = 0
+        for k in rng.choice(self.papers, size=num_samples):
+            self.flip(k)
+            count += self._counts()
+        return count / num_samples
+
+    def _counts(self):
+        """
+        Whether the current mask is at least as extreme as the observed one.
+        """
+
+        return abs(self.difference()) >= abs(self.diff_observed)
+
+
+def _paper_pair_statistics(scores, k):
+    """
+    The pair statistics (as in kendall_pair_statistics) of only the pairs
+    (k, j) with j != k, in time O(n). The scores are given as an array of
+    shape (c, 2, n), with the scores of both PCs for c configurations, and
+    the result is an array of shape (c, 5).
+
+    For each configuration and paper j, the two signs of the comparisons
+    with paper k are combined into one of 3 * 3 codes, and a single bincount
+    then counts all codes of all configurations at once.
+
+    >>> _paper_pair_statistics(np.array([[[1, 2, 2, 3], [1, 1, 2, 3]]]),
+    ...                        1).tolist()
+    [[1, 0, 1, 1, 0]]
+    """
+
+    c, _, n = scores.shape
+    signs = _sign_of_difference(scores[:, :, k:k + 1], scores)
+    codes = 3 * signs[:, 0] + signs[:, 1] + \
+        (4 + 9 * np.arange(c)).reshape(c, 1)
+    counts = np.bincount(codes.ravel(), minlength=9 * c).reshape(c, 9)
+    # The comparison of paper k with itself has code 4 (tied in both).
+    counts[:, 4] -= 1
+    return counts @ _pair_statistics_by_sign_code
+
+
+# Maps the count of each of the 3 * 3 codes from _paper_pair_statistics (in
+# the order (-1, -1), (-1, 0), (-1, +1), (0, -1), ...) to the five entries of
+# a PairStatistics record.
+_pair_statistics_by_sign_code = np.array([
+    [1, 0, 0, 0, 0], [0, 0, 0, 1, 0], [0, 1, 0, 0, 0],
+    [0, 0, 1, 0, 0], [0, 0, 0, 0, 1], [0, 0, 1, 0, 0],
+    [0, 1, 0, 0, 0], [0, 0, 0, 1, 0], [1, 0, 0, 0, 0]])
+
+
+class DynamicKendallTau:
+    """
+    Maintain the pair statistics (see kendall_pair_statistics), and hence
+    all three Kendall tau variants, between the scores of two PCs, while
+    single scores change, for example during the discussion phases.
+
+    The scores are stored as points (score of PC1, score of PC2), one per
+    paper, in a two-dimensional Fenwick tree (see class FenwickTree2D) over
+    2V + 1 slots for each PC, where V is the number of distinct score values
+    when the tree was built: slot 2r + 1 is for the value of rank r, and slot
+    2r is for the values between those of rank r - 1 and r. The contribution
+    of one paper to the pair statistics can then be computed from a constant
+    number of dominance counts, in time O(log^2 V).
+
+    This is exact, except for pairs of papers with different values in the
+    same in-between slot, which the tree counts as tied. These pairs are
+    corrected one by one, which takes time O(p) for p papers with a value in
+    an in-between slot. When an update would make p larger than about
+    sqrt(n), the tree is built again instead, over the current values only
+    (the values which are no longer used are dropped). This takes time
+    O(n log^2 V), but happens at most once every sqrt(n) updates, so that an
+    update takes amortized time O(sqrt(n) log^2 V), even when (like for a
+    continuous score type) almost every update brings a new value. The
+    attribute work counts the papers and pairs processed.
+
+    >>> dk = DynamicKendallTau([1, 2, 3, 4], [2, 3, 4, 5])
+    >>> dk.statistics()
+    PairStatistics(nc=6, nd=0, nt1=0, nt2=0, nt12=0)
+    >>> dk.update(2, 1, 3)
+    >>> dk.statistics()
+    PairStatistics(nc=5, nd=0, nt1=0, nt2=1, nt12=0)
+    >>> dk.tau_b() == kendall_tau_b([1, 2, 3, 4], [2, 3, 3, 5])
+    True
+    >>> dk.update(0, 0, 5)
+    >>> dk.statistics() == kendall_pair_statistics([5, 2, 3, 4], [2, 3, 3, 5])
+    True
+
+    For continuous scores, the work per update is far below n:
+
+    >>> rng = random.Random(1)
+    >>> n = 1000
+    >>> scores = [[rng.random() for _ in range(n)] for _ in range(2)]
+    >>> dk = DynamicKendallTau(*scores)
+    >>> dk.work = 0
+    >>> for _ in range(300):
+    ...     paper, pc = rng.randrange(n), rng.randrange(2)
+    ...     scores[pc][paper] = rng.random()
+    ...     dk.update(paper, pc, scores[pc][paper])
+    >>> dk.work / 300 < n / 10
+    True
+    >>> dk.statistics() == kendall_pair_statistics(*scores)
+    True
+    """
+
+    # The index of the entry of a PairStatistics record for each of the
+    # 3 * 3 codes of the signs of the comparisons, see _paper_pair_statistics.
+    _entry_by_sign_code = _pair_statistics_by_sign_code.argmax(axis=1).tolist()
+
+    def __init__(self, scores1, scores2, values1=(), values2=()):
+        """
+        Build the data structure for the given scores of the two PCs. The
+        optional values1 and values2 are additional score values to expect
+        for PC1 and PC2, respectively (for example, the labels of a discrete
+        score type), which are always kept in the tree.
+        """
+
+        assert len(scores1) == len(scores2)
+        self.scores = [list(scores1), list(scores2)]
+        self.expected_values = [set(values1), set(values2)]
+        self.max_pending = max(16, math.isqrt(len(self.scores[0])))
+        self.work = 0
+        self._build()
+
+    def update(self, paper, pc, new_score):
+        """
+        Set the score of the given paper (0, 1, ...) and PC (0 or 1) to the
+        given new score and update the pair statistics.
+        """
+
+        self._remove(paper)
+        self.scores[pc][paper] = new_score
+        if new_score not in self.ranks[pc] and \
+                len(self.pending) >= self.max_pending:
+            self._build()
+        else:
+            self._insert(paper)
+
+    def statistics(self):
+        """
+        The current pair statistics as a PairStatistics record.
+        """
+
+        return PairStatistics(*self.stats)
+
+    def tau_a(self):
+        """
+        The current value of kendall_tau_a, in constant time.
+        """
+
+        return kendall_tau_a_from_statistics(self.statistics())
+
+    def tau_b(self):
+        """
+        The current value of kendall_tau_b, in constant time.
+        """
+
+        return kendall_tau_b_from_statistics(self.statistics())
+
+    def tau_p(self, p=0.50):
+        """
+        The current value of kendall_tau_p, in constant time.
+        """
+
+        return kendall_tau_p_from_statistics(self.statistics(), p)
+
+    def _build(self):
+        """
+        Build the Fenwick trees over the current score values (and the
+        expected ones) from scratch.
+        """
+
+        self.values = [sorted(set(scores) | expected) for scores, expected
+                       in zip(self.scores, self.expected_values)]
+        self.ranks = [{x: i for i, x in enumerate(values)}
+                      for values in self.values]
+        self.points = FenwickTree2D(2 * len(self.values[0]) + 1,
+                                    2 * len(self.values[1]) + 1)
+        self.marginals = [FenwickTree(2 * len(self.values[0]) + 1),
+                          FenwickTree(2 * len(self.values[1]) + 1)]
+        self.num_points = 0
+        self.stats = [0, 0, 0, 0, 0]
+        self.slots = [None] * len(self.scores[0])
+        self.in_between = [{}, {}]
+        self.pending = set()
+        for paper in range(len(self.scores[0])):
+            self._insert(paper)
+
+    def _insert(self, paper):
+        """
+        Add the pairs of the given paper with all papers in the trees to the
+        pair statistics, and then add the paper to the trees.
+        """
+
+        x, y = self.slots[paper] = self._slots(paper)
+        counts = self._pair_statistics(x, y)
+        self._correct(paper, counts)
+        for i, count in enumerate(counts):
+            self.stats[i] += count
+        self.points.add(x, y, 1)
+        self.marginals[0].add(x, 1)
+        self.marginals[1].add(y, 1)
+        self.num_points += 1
+        for pc, slot in enumerate((x, y)):
+            if slot % 2 == 0:
+                self.in_between[pc].setdefault(slot, set()).add(paper)
+                self.pending.add(paper)
+        self.work += 1
+
+    def _remove(self, paper):
+        """
+        Remove the given paper from the trees, and then remove its pairs with
+        all papers in the trees from the pair statistics.
+        """
+
+        x, y = self.slots[paper]
+        for pc, slot in enumerate((x, y)):
+            if slot % 2 == 0:
+                self.in_between[pc][slot].discard(paper)
+        self.pending.discard(paper)
+        self.points.add(x, y, -1)
+        self.marginals[0].add(x, -1)
+        self.marginals[1].add(y, -1)
+        self.num_points -= 1
+        counts = self._pair_statistics(x, y)
+        self._correct(paper, counts)
+        for i, count in enumerate(counts):
+            self.stats[i] -= count
+        self.work += 1
+
+    def _slots(self, paper):
+        """
+        The slots of the two scores of the given paper.
+        """
+
+        slots = []
+        for pc in range(2):
+            score = self.scores[pc][paper]
+            rank = self.ranks[pc].get(score)
+            slots.append(2 * rank + 1 if rank is not None else
+                         2 * bisect.bisect_left(self.values[pc], score))
+        return tuple(slots)
+
+    def _correct(self, paper, counts):
+        """
+        Correct the pair statistics counts of the given paper (not in the
+        trees) with all papers in the trees, for the pairs which share an
+        in-between slot, where the trees count a tie.
+        """
+
+        x, y = self.slots[paper]
+        others = set()
+        for pc, slot in enumerate((x, y)):
+            if slot % 2 == 0:
+                others |= self.in_between[pc].get(slot, set())
+        for other in others:
+            other_x, other_y = self.slots[other]
+            counts[self._entry(x - other_x, y - other_y)] -= 1
+            counts[self._entry(
+                self.scores[0][paper] - self.scores[0][other],
+                self.scores[1][paper] - self.scores[1][other])] += 1
+            self.work += 1
+
+    def _entry(self, difference1, difference2):
+        """
+        The index of the entry of a PairStatistics record for a pair of
+        papers with the given differences of the scores of the two PCs.
+        """
+
+        return self._entry_by_sign_code[
+            3 * ((difference1 > 0) - (difference1 < 0) + 1) +
+            (difference2 > 0) - (difference2 < 0) + 1]
+
+    def _pair_statistics(self, x, y):
+        """
+        The pair statistics of a point with ranks (x, y) with all points in
+        the trees, from the dominance counts of the four corners of the cell
+        (x, y). Here lt, eq, gt mean <, ==, > the respective rank.
+        """
+
+        lt_lt = self.points.prefix_sum(x, y)
+        lt_le = self.points.prefix_sum(x, y + 1)
+        le_lt = self.points.prefix_sum(x + 1, y)
+        le_le = self.points.prefix_sum(x + 1, y + 1)
+        num_lt_x = self.marginals[0].prefix_sum(x)
+        num_le_x = self.marginals[0].prefix_sum(x + 1)
+        num_lt_y = self.marginals[1].prefix_sum(y)
+        num_le_y = self.marginals[1].prefix_sum(y + 1)
+        eq_eq = le_le - le_lt - lt_le + lt_lt
+        lt_gt = num_lt_x - lt_le
+        gt_lt = num_lt_y - le_lt
+        gt_gt = self.num_points - num_le_x - num_le_y + le_le
+        return [lt_lt + gt_gt, lt_gt + gt_lt,
+                num_le_x - num_lt_x - eq_eq, num_le_y - num_lt_y - eq_eq,
+                eq_eq]
+
+
+class FenwickTree:
+    """
+    Fenwick tree (binary indexed tree) over the positions 0, ..., n - 1, with
+    point updates and prefix sums in time O(log n).
+
+    >>> ft = FenwickTree(5)
+    >>> ft.add(1, 2)
+    >>> ft.add(3, 1)
+    >>> [ft.prefix_sum(i) for i in range(6)]
+    [0, 0, 2, 2, 3, 3]
+    """
+
+    def __init__(self, n):
+        self.tree = [0] * (n + 1)
+
+    def add(self, i, delta):
+        """
+        Add delta at position i.
+        """
+
+        i += 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, i):
+        """
+        The sum over the positions 0, ..., i - 1.
+        """
+
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+class FenwickTree2D:
+    """
+    Two-dimensional Fenwick tree over the positions (i, j) with 0 <= i < n1
+    and 0 <= j < n2, with point updates and dominance sums in time O(log n1 *
+    log n2). The inner trees are dictionaries, so that the space is only
+    O(m log n1 log n2) for m non-zero points, and not O(n1 * n2).
+
+    >>> ft = FenwickTree2D(3, 3)
+    >>> ft.add(0, 2, 1)
+    >>> ft.add(1, 1, 1)
+    >>> [[ft.prefix_sum(i, j) for j in range(4)] for i in range(4)]
+    [[0, 0, 0, 0], [0, 0, 0, 1], [0, 0, 1, 2], [0, 0, 1, 2]]
+    """
+
+    def __init__(self, n1, n2):
+        self.n2 = n2
+        self.trees = [{} for _ in range(n1 + 1)]
+
+    def add(self, i, j, delta):
+        """
+        Add delta at position (i, j).
+        """
+
+        i += 1
+        while i < len(self.trees):
+            tree = self.trees[i]
+            k = j + 1
+            while k <= self.n2:
+                tree[k] = tree.get(k, 0) + delta
+                k += k & -k
+            i += i & -i
+
+    def prefix_sum(self, i, j):
+        """
+        The sum over all positions (i', j') with i' < i and j' < j.
+        """
+
+        total = 0
+        while i > 0:
+            tree = self.trees[i]
+            k = j
+            while k > 0:
+                total += tree.get(k, 0)
+                k -= k & -k
+            i -= i & -i
+        return total
+
+
 if __name__ == "__main__":
     if len(sys.argv) < 2 or sys.argv[1].endswith("help"):
         print(usage_info)
         sys.exit(1)
 
+    # Arguments of the form --name=value are options, the others are modes.
     modes = []
+    options = {}
     while sys.argv[-1].startswith("--"):
-        modes.append(sys.argv.pop())
+        arg = sys.argv.pop()
+        if "=" in arg:
+            name, value = arg[2:].split("=", 1)
+            options[name] = value
+        else:
+            modes.append(arg)
     modes.reverse()
-    if len(modes) == 0:
+    use_cache = "--no-cache" not in modes
+    use_profiler = "--profile" in modes or "profile" in options
+    modes = [mode for mode in modes if mode not in ["--no-cache", "--profile"]]
+    for name in options:
+        if name not in ["samples", "seed", "workers", "stop-early",
+                        "noise-sd", "papers", "accepted", "files",
+                        "report", "profile"]:
+            print()
+            print("Invalid option: \"--%s\" ... ignoring it" % name)
+    num_samples = int(options["samples"]) if "samples" in options else None
+    seed = int(options["seed"]) if "seed" in options else None
+    num_workers = int(options.get("workers", 1)) or os.cpu_count()
+    alpha = float(options["stop-early"]) if "stop-early" in options else None
+    if "noise-sd" in options:
+        score_noise_standard_deviation = float(options["noise-sd"])
+    if len(modes) == 0 and "report" in options:
+        modes = list(report_modes)
+    elif len(modes) == 0:
         modes = ["--kendall"]
 
     ee = EsaExperimentData()
-    ee.read_all_score_files()
+    ee.seed = seed
+    if use_profiler:
+        # The summary (and the cProfile) are written at exit, so that they
+        # are also written for runs which end with sys.exit.
+        ee.profiler = Profiler()
+        atexit.register(ee.profiler.print_summary)
+        if "profile" in options:
+            c_profile = cProfile.Profile()
+            atexit.register(c_profile.dump_stats, options["profile"])
+            atexit.register(c_profile.disable)
+            c_profile.enable()
+    if use_cache:
+        ee.result_cache = ResultCache("tmp/cache/results",
+                                      profiler=ee.profiler)
+    try:
+        ee.read_all_score_files("tmp/cache" if use_cache else None,
+                                options.get("files", score_file_pattern))
+    except ValueError as e:
+        print()
+        print("! %s" % e)
+        sys.exit(1)
 
     for score_type in sys.argv[1:]:
         if score_type not in score_type_names:
@@ -992,13 +4314,23 @@ if __name__ == "__main__":
             print(usage_info)
             sys.exit(1)
 
-        scores = [[[], []], [[], []], [[], []]]
-        scores[0][0] = ee.compute_scores(ee.all_scores[0][0], score_type)
-        scores[0][1] = ee.compute_scores(ee.all_scores[0][1], score_type)
-        scores[1][0] = ee.compute_scores(ee.all_scores[1][0], score_type)
-        scores[1][1] = ee.compute_scores(ee.all_scores[1][1], score_type)
-        scores[2][0] = ee.compute_scores(ee.all_scores[2][0], score_type)
-        scores[2][1] = ee.compute_scores(ee.all_scores[2][1], score_type)
+    # With --report, compute all results at once and write them to a file.
+    if "report" in options:
+        try:
+            report = ee.report(sys.argv[1:] or list(score_type_names), modes,
+                               num_samples, seed, num_workers)
+        except ValueError as e:
+            print()
+            print("! %s" % e)
+            sys.exit(1)
+        with open(options["report"], "w") as report_file:
+            json.dump(report, report_file, indent=1)
+        print("Report for %d score types and %d modes written to \"%s\""
+              % (len(report["score_types"]), len(modes), options["report"]))
+        sys.exit(0)
+
+    for score_type in sys.argv[1:]:
+        scores = ee.compute_all_scores(score_type)
 
         score_type_name = score_type_names[score_type]
         print()
@@ -1007,13 +4339,59 @@ if __name__ == "__main__":
 
         for mode in modes:
             if mode == "--kendall":
-                ee.print_kendall_tau(scores)
+                ee.print_kendall_tau(scores, num_workers, score_type)
             elif mode == "--overlap":
-                ee.print_overlap(scores, "tmp")
+                ee.print_overlap(scores, "tmp", score_type=score_type)
+            elif mode == "--overlap-random-ties":
+                ee.print_overlap(scores, "tmp", random_ties=True,
+                                 score_type=score_type)
+            elif mode == "--bootstrap":
+                ee.print_bootstrap_intervals(scores, num_samples or 10000,
+                                             seed)
+            elif mode == "--decision-stability":
+                if is_random_score_type(score_type):
+                    print()
+                    print("! Resampling the reviews does not work for the "
+                          "random score types")
+                    continue
+                ee.print_decision_stability(scores, score_type,
+                                            num_samples or 10000, seed)
+            elif mode == "--simulate":
+                if score_type not in ["avr", "l5r", "rnd"]:
+                    print()
+                    print("! Simulation only works for the score types avr, "
+                          "l5r, rnd")
+                    continue
+                ee.print_conference_simulation(
+                    score_type, num_samples or 10000,
+                    int(options.get("papers", len(ee.all_scores[0][0]))),
+                    int(options.get("accepted", num_accepted)), seed,
+                    num_workers)
+            elif mode == "--calibrate-noise":
+                random_score_types = {real: simulated for simulated, real
+                                      in simulated_score_types.items()}
+                if score_type not in random_score_types:
+                    print()
+                    print("! Noise calibration only works for the score "
+                          "types %s" % ", ".join(random_score_types))
+                    continue
+                ee.print_noise_calibration(random_score_types[score_type],
+                                           num_samples or 2000, seed)
             elif mode == "--print":
                 ee.print_scores(scores, score_type, "tmp")  # in subdir "tmp"
             elif mode == "--rtest":
-                ee.rtest(scores)
+                ee.rtest(scores, num_samples=num_samples or 2048, seed=seed,
+                         score_type=score_type)
+            elif mode == "--rtest-batch":
+                ee.rtest(scores, num_samples=num_samples or 131072,
+                         method="batch", seed=seed, num_workers=num_workers,
+                         alpha=alpha, score_type=score_type)
+            elif mode == "--rtest-walk":
+                ee.rtest(scores, num_samples=num_samples or 131072,
+                         method="walk", seed=seed, score_type=score_type)
+            elif mode == "--rtest-exact":
+                ee.rtest(scores, num_samples=num_samples or 131072,
+                         method="exact", seed=seed, score_type=score_type)
             elif mode == "--confusion-pcs":
                 ee.print_confusion_matrices(scores, score_type, "pcs")
             elif mode == "--confusion-phases":
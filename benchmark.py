@@ -0,0 +1,266 @@
+"""
+Benchmarks for analyze.py on synthetic score files of increasing size.
+
+Usage: python3 benchmark.py [--sizes=51,1000,...] [--save=<file>]
+                            [--compare=<file>] [--threshold=<factor>]
+
+For each size (number of papers), six score files in the format described
+in FORMAT.md are generated in the sub-directory "tmp/bench" (only once for
+each size), and the operations in the list benchmarks below are timed on
+them. With --save, the timings are written to a JSON file, and with
+--compare, they are compared to those from such a file (the baseline), and
+each operation which got slower by more than the threshold factor (default:
+1.5) is reported as a regression. Then the exit code is 1, so that "make
+bench" fails.
+"""
+
+import os
+import sys
+import json
+import time
+import pathlib
+import platform
+import functools
+import numpy as np
+import analyze
+
+# The default sizes, the directory for the generated files, and the default
+# threshold for a regression. Timings below min_seconds are too noisy to be
+# compared.
+default_sizes = [51, 1000, 10000, 100000, 1000000]
+bench_dir = "tmp/bench"
+default_threshold = 1.5
+min_seconds = 0.005
+
+
+def generate_score_files(num_papers, directory, seed=0,
+                         fraction_four_reviews=0.25, fraction_voted=0.25):
+    """
+    Write six score files scores-phase<n>-pc<i>.tsv for num_papers papers
+    into the given directory, in the format described in FORMAT.md. Each
+    paper has a quality, and each review score is that quality plus noise,
+    rounded to {-2, ..., +2}. A paper has three reviews (padded with "__" and
+    "_") or, with probability fraction_four_reviews, four. In phase 2, some
+    reviewers move their score towards the average, and in phase 3, a
+    fraction_voted of the papers get a vote column (the PC score with
+    confidence 5), and some of the others a trailing empty column.
+
+    >>> generate_score_files(20, "tmp/test-bench", seed=1)
+    >>> ee = analyze.EsaExperimentData()
+    >>> ee.read_all_score_files(pattern="tmp/test-bench/scores-phase*-pc*.tsv")
+    >>> [[len(table) for table in tables] for tables in ee.all_scores]
+    [[20, 20], [20, 20], [20, 20]]
+    >>> sorted(set(ee.all_scores[2][0].num_reviews.tolist()))
+    [3, 4]
+    >>> bool(ee.all_scores[2][0].has_vote.any())
+    True
+    """
+
+    pathlib.Path(directory).mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    quality = rng.uniform(-2, 2, num_papers)
+    score_tokens = np.array(["-2", "-1", "+0", "+1", "+2"])
+    confidence_tokens = np.array(["1", "2", "3", "4", "5"])
+    for pc in range(1, 3):
+        has_fourth_review = rng.random(num_papers) < fraction_four_reviews
+        scores = np.clip(np.round(quality[:, None] +
+                                  rng.normal(0, 1, (num_papers, 4))), -2, 2)
+        confidences = rng.integers(1, 6, (num_papers, 4))
+        for phase in range(1, 4):
+            if phase > 1:
+                mean = np.round(scores[:, :3].mean(axis=1, keepdims=True))
+                moves = rng.random((num_papers, 4)) < 0.2
+                scores = np.where(moves, mean, scores)
+            score_columns = score_tokens[scores.astype(int) + 2]
+            confidence_columns = confidence_tokens[confidences - 1]
+            columns = []
+            for i in range(4):
+                score_column = score_columns[:, i]
+                confidence_column = confidence_columns[:, i]
+                if i == 3:
+                    score_column = np.where(has_fourth_review,
+                                            score_column, "__")
+                    confidence_column = np.where(has_fourth_review,
+                                                 confidence_column, "_")
+                columns += [score_column, confidence_column]
+            lines = functools.reduce(
+                lambda x, y: np.char.add(np.char.add(x, "\t"), y), columns)
+            if phase == 3:
+                is_voted = rng.random(num_papers) < fraction_voted
+                votes = np.char.mod("\t%+.4f\t5", np.clip(
+                    quality + rng.normal(0, 0.5, num_papers), -2, 2))
+                lines = np.char.add(lines, np.where(
+                    is_voted, votes,
+                    np.where(rng.random(num_papers) < 0.1, "\t", "")))
+            file_name = os.path.join(
+                directory, "scores-phase%d-pc%d.tsv" % (phase, pc))
+            with open(file_name, "w") as f:
+                f.write("\n".join(lines.tolist()) + "\n")
+
+
+def time_function(function, min_total_seconds=0.2, max_repeats=20):
+    """
+    Run the function repeatedly, until it took min_total_seconds in total
+    (at least once and at most max_repeats times), and return the shortest
+    time of a run in seconds.
+
+    >>> time_function(lambda: None) < 0.01
+    True
+    """
+
+    times = []
+    while not times or (sum(times) < min_total_seconds and
+                        len(times) < max_repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+# The benchmarks, as (name, maximal size, function). The function gets the
+# experiment data (with the six score files read) and a dictionary with the
+# name of the first file and the av and l5 scores of the first two phases,
+# and returns the function to be timed. The maximal size is None for
+# benchmarks which work for all sizes, and otherwise the size above which
+# they would take too long (the R-test is quadratic in the number of papers).
+benchmarks = [
+    ("read_score_file", None, lambda ee, data: functools.partial(
+        ee.read_score_file, data["file_name"])),
+    ("read_score_table", None, lambda ee, data: functools.partial(
+        ee.read_score_table, data["file_name"])),
+    ("read_score_table_cached", None, lambda ee, data: functools.partial(
+        ee.read_score_table, data["file_name"], bench_dir + "/cache")),
+] + [
+    ("compute_scores_" + score_type, None,
+     lambda ee, data, score_type=score_type: functools.partial(
+         ee.compute_scores, ee.all_scores[0][0], score_type, seed=1))
+    for score_type in analyze.score_type_names
+] + [
+    ("compute_all_scores_all_types", None, lambda ee, data: lambda: [
+        ee.score_cache.clear()] + [ee.compute_all_scores(score_type)
+                                   for score_type in
+                                   analyze.score_type_names]),
+    ("kendall_tau_a", None, lambda ee, data: functools.partial(
+        analyze.kendall_tau_a, *data["av"][0])),
+    ("kendall_tau_b", None, lambda ee, data: functools.partial(
+        analyze.kendall_tau_b, *data["av"][0])),
+    ("kendall_tau_p", None, lambda ee, data: functools.partial(
+        analyze.kendall_tau_p, *data["av"][0])),
+    ("overlap_topk", None, lambda ee, data: functools.partial(
+        analyze.overlap_topk, *data["l5"][0],
+        max(1, len(data["l5"][0][0]) // 4))),
+    ("overlap_curve", None, lambda ee, data: functools.partial(
+        analyze.overlap_curve, *data["l5"][0])),
+    ("overlap_curve_random_ties", None, lambda ee, data: functools.partial(
+        analyze.overlap_curve, *data["l5"][0], random_ties=True)),
+    ("confusion_matrices", None, lambda ee, data: functools.partial(
+        analyze.confusion_matrices, data["l5"],
+        analyze.score_labels_by_type["l5"])),
+    ("rtest_batch_256", 1000, lambda ee, data: functools.partial(
+        analyze.rtest_p_value, *data["av"], 256, "batch", seed=1)),
+    ("rtest_walk_256", 10000, lambda ee, data: functools.partial(
+        analyze.rtest_p_value, *data["av"], 256, "walk", seed=1)),
+]
+
+
+def run_benchmarks(num_papers, names=None):
+    """
+    Generate the score files for the given number of papers (if they do not
+    exist yet) and run the benchmarks (or those with the given names) on
+    them. Returns a dictionary from benchmark name to seconds.
+
+    >>> timings = run_benchmarks(51, ["overlap_curve", "kendall_tau_b"])
+    >>> sorted(timings)
+    ['kendall_tau_b', 'overlap_curve']
+    """
+
+    directory = "%s/n%d" % (bench_dir, num_papers)
+    pattern = directory + "/scores-phase*-pc*.tsv"
+    if not os.path.exists(directory + "/scores-phase3-pc2.tsv"):
+        generate_score_files(num_papers, directory)
+    ee = analyze.EsaExperimentData()
+    ee.seed = 1
+    ee.read_all_score_files(pattern=pattern)
+    data = {"file_name": analyze.score_file_names(pattern)[0][0]}
+    for score_type in ["av", "l5"]:
+        data[score_type] = [[ee.compute_scores(table, score_type)
+                             for table in tables]
+                            for tables in ee.all_scores[:2]]
+    timings = {}
+    for name, max_size, make_function in benchmarks:
+        if names is not None and name not in names or \
+                max_size is not None and num_papers > max_size:
+            continue
+        timings[name] = time_function(make_function(ee, data))
+    return timings
+
+
+def compare_timings(timings, baseline, threshold=default_threshold):
+    """
+    Compare the timings (a dictionary from size to a dictionary from name to
+    seconds) to the baseline (the same). Returns a list of the regressions,
+    as tuples (size, name, baseline seconds, seconds), where the timing is
+    more than threshold times that of the baseline. Timings below
+    min_seconds in both are ignored.
+
+    >>> compare_timings({"51": {"a": 0.1, "b": 0.5, "c": 0.001}},
+    ...                 {"51": {"a": 0.1, "b": 0.2, "c": 0.0001}})
+    [('51', 'b', 0.2, 0.5)]
+    """
+
+    regressions = []
+    for size, size_timings in timings.items():
+        for name, seconds in size_timings.items():
+            baseline_seconds = baseline.get(size, {}).get(name)
+            if baseline_seconds is None or \
+                    max(seconds, baseline_seconds) < min_seconds:
+                continue
+            if seconds > threshold * baseline_seconds:
+                regressions.append((size, name, baseline_seconds, seconds))
+    return regressions
+
+
+if __name__ == "__main__":
+    options = {}
+    for arg in sys.argv[1:]:
+        name, _, value = arg[2:].partition("=")
+        if not arg.startswith("--") or \
+                name not in ["sizes", "save", "compare", "threshold"]:
+            print(__doc__)
+            sys.exit(1)
+        options[name] = value
+    sizes = [int(size) for size in options["sizes"].split(",")] \
+        if "sizes" in options else default_sizes
+    threshold = float(options.get("threshold", default_threshold))
+
+    timings = {}
+    for size in sizes:
+        print()
+        print("\x1b[1mBenchmarks for %d papers\x1b[0m" % size)
+        print()
+        timings[str(size)] = run_benchmarks(size)
+        for name, seconds in timings[str(size)].items():
+            print("%-32s %10.4f s" % (name, seconds))
+
+    if "save" in options:
+        with open(options["save"], "w") as f:
+            json.dump({"python": platform.python_version(),
+                       "numpy": np.__version__,
+                       "timings": timings}, f, indent=1)
+        print()
+        print("Timings saved to \"%s\"" % options["save"])
+    if "compare" in options:
+        with open(options["compare"]) as f:
+            baseline = json.load(f)["timings"]
+        regressions = compare_timings(timings, baseline, threshold)
+        print()
+        if not regressions:
+            print("No regressions compared to \"%s\" (threshold %.2f)"
+                  % (options["compare"], threshold))
+        for size, name, baseline_seconds, seconds in regressions:
+            print("\x1b[31mRegression for %s papers: %s takes %.4f s "
+                  "instead of %.4f s (%.1fx)\x1b[0m"
+                  % (size, name, seconds, baseline_seconds,
+                     seconds / baseline_seconds))
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,380 @@
+"""
+A local HTTP server which answers queries about the score files, so that
+the files are only read once, and not for every query.
+
+Usage: python3 server.py [--port=<port> | --socket=<path>] [--files=<pattern>]
+                         [--workers=<w>] [--no-cache]
+
+The server listens on localhost (default port: 8000) or, with --socket, on a
+Unix socket. For the score files and --files, see analyze.py. They are read
+again automatically when one of them changes. All queries are GET requests,
+the answers are JSON:
+
+/status
+  the number of phases, PCs and papers, and the score files
+/tau?type=<t>&phases=<i1>,<i2>&pcs=<j1>,<j2>
+  the Kendall tau correlations (a, b, p) between the scores of type t of PC
+  j1 after phase i1 and those of PC j2 after phase i2
+/overlap?type=<t>&phase=<i>&pcs=<j1>,<j2>[&random_ties=1]
+  the overlap of the top k papers of PCs j1 and j2 after phase i, for each k
+/confusion?type=<t>&mode=<pcs|phases|phases-individual-scores>
+  the confusion matrices of --confusion-<mode> in analyze.py
+/rtest?type=<t>&phases=<i1>,<i2>&pcs=<j1>,<j2>[&method=<batch|walk|exact>]
+       [&samples=<n>][&seed=<s>]
+  the p-value of the R-test between the two phases for the two PCs
+
+Example: curl "localhost:8000/tau?type=l5&phases=1,1&pcs=1,2"
+
+The results are cached like those of analyze.py, in the same cache (unless
+--no-cache is given), and shared with it where the query is one of the
+comparisons of analyze.py (for /tau, those of --kendall). The R-tests run
+in a pool of worker processes (default: all cores), so that the server keeps
+answering other queries meanwhile.
+"""
+
+import os
+import sys
+import glob
+import json
+import asyncio
+import threading
+import urllib.parse
+import concurrent.futures
+import analyze
+
+# The limit for the number of samples of an R-test, so that a single query
+# cannot keep a worker busy for hours.
+max_rtest_samples = 2 ** 22
+
+
+class QueryError(ValueError):
+    """
+    An invalid query (answered with status 400).
+    """
+
+
+class AnalysisServer:
+    """
+    The data and the queries of the server. The score files are read again
+    (with a new EsaExperimentData) when the names, sizes or modification
+    times of the files matching the pattern change. The parse cache and the
+    result cache are shared by all of them.
+
+    >>> server = AnalysisServer(cache_dir=None)
+    Read 6 score files with 51 papers
+    >>> asyncio.run(server.query("/tau", {"type": ["l5"],
+    ...                                   "phases": ["1,1"], "pcs": ["1,2"]}))
+    ... # doctest: +ELLIPSIS
+    {'tau_a': 0.357..., 'tau_b': 0.481..., 'tau_p': 0.332...}
+    >>> ee = server.ee
+    >>> ee.kendall_correlations(ee.compute_all_scores("l5"))[0] == list(
+    ...     asyncio.run(server.query("/tau", {"type": ["l5"],
+    ...                                       "phases": ["1,1"],
+    ...                                       "pcs": ["2,1"]})).values())
+    True
+    >>> asyncio.run(server.query("/tau", {"type": ["l5"], "phases": ["1"]}))
+    Traceback (most recent call last):
+    ...
+    server.QueryError: Parameter "phases" must be two numbers, like 1,2
+    >>> server.close()
+    """
+
+    def __init__(self, pattern=analyze.score_file_pattern,
+                 cache_dir="tmp/cache", num_workers=1):
+        self.pattern = pattern
+        self.cache_dir = cache_dir
+        self.result_cache = None if cache_dir is None else \
+            analyze.ResultCache(os.path.join(cache_dir, "results"))
+        self.executor = concurrent.futures.ProcessPoolExecutor(num_workers)
+        self.file_state = None
+        self.ee = None
+        self.reload_lock = threading.Lock()
+        self.reload_if_changed()
+
+    def reload_if_changed(self):
+        """
+        Read the score files again if they changed since the last time. If
+        they cannot be read (for example, while they are being written), keep
+        the old data and print a warning. Only one thread at a time reloads.
+
+        >>> import shutil
+        >>> shutil.rmtree("tmp/test-server", ignore_errors=True)
+        >>> os.makedirs("tmp/test-server")
+        >>> for file_name in glob.glob(analyze.score_file_pattern):
+        ...     _ = shutil.copy(file_name, "tmp/test-server")
+        >>> server = AnalysisServer("tmp/test-server/scores-phase*-pc*.tsv",
+        ...                         cache_dir=None)
+        Read 6 score files with 51 papers
+        >>> os.symlink("missing.tsv", "tmp/test-server/scores-phase4-pc1.tsv")
+        >>> server.reload_if_changed() # doctest: +ELLIPSIS
+        ! Keeping the old scores, reading the files failed: [Errno 2] ...
+        >>> server.close()
+        """
+
+        with self.reload_lock:
+            self._reload_if_changed()
+
+    def _reload_if_changed(self):
+        ee = analyze.EsaExperimentData()
+        ee.result_cache = self.result_cache
+        try:
+            # A file can disappear between the glob and the stat.
+            file_state = sorted((file_name, stat.st_size, stat.st_mtime_ns)
+                                for file_name in glob.glob(self.pattern)
+                                for stat in [os.stat(file_name)])
+            if file_state == self.file_state:
+                return
+            ee.read_all_score_files(self.cache_dir, self.pattern)
+        except (OSError, ValueError) as e:
+            if self.ee is None:
+                raise
+            print("! Keeping the old scores, reading the files failed: %s"
+                  % e)
+            return
+        self.ee = ee
+        self.file_state = file_state
+        print("Read %d score files with %d papers"
+              % (len(file_state), len(ee.all_scores[0][0])))
+
+    async def query(self, path, parameters):
+        """
+        Answer the query for the given path and parameters (a dictionary from
+        name to list of values, like from urllib.parse.parse_qs), as a value
+        which can be written as JSON. Raises a QueryError if the query is
+        invalid. The reloading and the computations run in threads, so that
+        the event loop is not blocked.
+        """
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.reload_if_changed)
+        ee = self.ee
+        num_phases = len(ee.all_scores)
+        num_pcs = len(ee.all_scores[0])
+
+        def parameter(name, default=None):
+            if name in parameters:
+                return parameters[name][-1]
+            if default is None:
+                raise QueryError("Missing parameter \"%s\"" % name)
+            return default
+
+        def numbers(name, maximum, count):
+            value = parameter(name)
+            try:
+                values = [int(value) for value in value.split(",")]
+            except ValueError:
+                values = []
+            if len(values) != count:
+                raise QueryError("Parameter \"%s\" must be %s, like %s"
+                                 % (name, "two numbers" if count == 2
+                                    else "a number", "1,2"[:2 * count - 1]))
+            for value in values:
+                if not 1 <= value <= maximum:
+                    raise QueryError("Parameter \"%s\" must be from 1 to %d"
+                                     % (name, maximum))
+            return [value - 1 for value in values]
+
+        if path == "/status":
+            return {"num_phases": num_phases, "num_pcs": num_pcs,
+                    "num_papers": len(ee.all_scores[0][0]),
+                    "files": analyze.score_file_names(self.pattern)}
+        score_type = parameter("type")
+        if score_type not in analyze.score_type_names:
+            raise QueryError("Score type \"%s\" does not exist" % score_type)
+        scores = await loop.run_in_executor(None, ee.compute_all_scores,
+                                            score_type)
+        if path == "/tau":
+            (i1, i2), (j1, j2) = \
+                numbers("phases", num_phases, 2), numbers("pcs", num_pcs, 2)
+            comparisons = [sorted(comparison[1:]) for group
+                           in analyze.pc_comparisons(num_phases, num_pcs)
+                           for comparison in group]
+            comparison = sorted([(i1, j1), (i2, j2)])
+            if comparison in comparisons:
+                taus = (await loop.run_in_executor(
+                    None, ee.kendall_correlations, scores, 1, score_type))[
+                        comparisons.index(comparison)]
+            else:
+                taus = await loop.run_in_executor(
+                    None, ee.cached_result, [score_type], "tau",
+                    {"phases": [i1 + 1, i2 + 1], "pcs": [j1 + 1, j2 + 1]},
+                    lambda: analyze.kendall_correlations_pairs(
+                        [(scores[i1][j1], scores[i2][j2])])[:, 0].tolist())
+            return analyze._json_value(dict(zip(["tau_a", "tau_b", "tau_p"],
+                                                taus)))
+        if path == "/overlap":
+            [i], (j1, j2) = \
+                numbers("phase", num_phases, 1), numbers("pcs", num_pcs, 2)
+            if j1 == j2:
+                raise QueryError("Parameter \"pcs\" must be two different "
+                                 "PCs")
+            if j1 > j2:
+                j1, j2 = j2, j1
+            random_ties = parameter("random_ties", "0") == "1"
+            pc_pairs = [(j1, j2) for j1 in range(num_pcs)
+                        for j2 in range(j1 + 1, num_pcs)]
+            curves = await loop.run_in_executor(
+                None, ee.overlap_curves, scores, random_ties, score_type)
+            return curves[pc_pairs.index((j1, j2)) * num_phases + i]
+        if path == "/confusion":
+            mode = parameter("mode")
+            if mode not in ["pcs", "phases", "phases-individual-scores"]:
+                raise QueryError("Mode \"%s\" does not exist" % mode)
+            if score_type not in analyze.score_labels_by_type:
+                raise QueryError("Confusion matrices only work for discrete "
+                                 "scores")
+            try:
+                matrices = await loop.run_in_executor(
+                    None, ee.mode_confusion_matrices, scores, score_type, mode)
+            except KeyError as e:
+                raise QueryError("Score %s has no label" % e.args[0])
+            return {"labels": analyze.score_labels_by_type[score_type],
+                    "matrices": matrices}
+        if path == "/rtest":
+            (i1, i2), (j1, j2) = \
+                numbers("phases", num_phases, 2), numbers("pcs", num_pcs, 2)
+            method = parameter("method", "batch")
+            if method not in ["batch", "walk", "exact"]:
+                raise QueryError("Method \"%s\" does not exist" % method)
+            try:
+                num_samples = int(parameter(
+                    "samples", str(analyze.report_modes["--rtest-" + method])))
+                seed = int(parameter("seed")) if "seed" in parameters \
+                    else None
+            except ValueError:
+                raise QueryError("Parameters \"samples\" and \"seed\" must "
+                                 "be numbers")
+            if not 1 <= num_samples <= max_rtest_samples:
+                raise QueryError("Parameter \"samples\" must be from 1 to %d"
+                                 % max_rtest_samples)
+            return await self.rtest(ee, score_type, scores, (i1, i2),
+                                    (j1, j2), method, num_samples, seed)
+        raise QueryError("Unknown query \"%s\"" % path)
+
+    async def rtest(self, ee, score_type, scores, phases, pcs, method,
+                    num_samples, seed):
+        """
+        The p-value of the R-test for the query /rtest. The result cache is
+        the same as that of EsaExperimentData.rtest. The test runs in the pool
+        of worker processes, and the cache is accessed in a thread, so that
+        the event loop is not blocked (and no thread waits for the test).
+        """
+
+        (i1, i2), (j1, j2) = phases, pcs
+        scores_1 = [scores[i1][j1], scores[i1][j2]]
+        scores_2 = [scores[i2][j1], scores[i2][j2]]
+        parameters = {"phases": [i1 + 1, i2 + 1], "pcs": [j1 + 1, j2 + 1],
+                      "num_samples": num_samples, "seed": seed}
+        if method == "batch":
+            parameters["alpha"] = None
+            function, args = analyze.rtest_p_value_batch, \
+                (scores_1, scores_2, num_samples, seed)
+        else:
+            function, args = analyze.rtest_p_value, \
+                (scores_1, scores_2, num_samples, method, seed)
+        loop = asyncio.get_running_loop()
+        key = ee.result_key([score_type], "rtest-" + method, parameters)
+        result = None
+        if key is not None:
+            try:
+                result = await loop.run_in_executor(
+                    None, ee.result_cache.get, key)
+            except KeyError:
+                pass
+        if result is None:
+            result = await asyncio.wrap_future(
+                self.executor.submit(function, *args))
+            if key is not None:
+                await loop.run_in_executor(None, ee.result_cache.put, key,
+                                           result)
+        if method == "batch":
+            p_value, num_samples_used = result
+            comment = "batch, %d samples" % num_samples_used
+        else:
+            p_value, comment = result
+        return {"p_value": p_value, "comment": comment}
+
+    async def handle_connection(self, reader, writer):
+        """
+        Read one HTTP request from the connection and write the answer.
+        """
+
+        try:
+            request_line = (await reader.readline()).decode("latin-1")
+            while (await reader.readline()).strip():
+                pass
+            method, target, _ = request_line.split(" ", 2)
+            if method != "GET":
+                status, answer = 405, {"error": "Only GET is supported"}
+            else:
+                url = urllib.parse.urlsplit(target)
+                try:
+                    status, answer = 200, await self.query(
+                        url.path, urllib.parse.parse_qs(url.query))
+                except QueryError as e:
+                    status, answer = 400, {"error": str(e)}
+                except Exception as e:
+                    status, answer = 500, {"error": "%s: %s"
+                                           % (type(e).__name__, e)}
+        except ValueError:
+            status, answer = 400, {"error": "Malformed request"}
+        body = (json.dumps(answer) + "\n").encode()
+        writer.write(("HTTP/1.1 %d %s\r\n"
+                      "Content-Type: application/json\r\n"
+                      "Content-Length: %d\r\n"
+                      "Connection: close\r\n\r\n"
+                      % (status, {200: "OK", 400: "Bad Request",
+                                  405: "Method Not Allowed",
+                                  500: "Internal Server Error"}[status],
+                         len(body))).encode() + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    def close(self):
+        self.executor.shutdown()
+
+
+async def serve(server, port=8000, socket_path=None):
+    """
+    Answer queries until interrupted, on the given port of localhost or, if
+    given, on the Unix socket with the given path.
+    """
+
+    if socket_path is not None:
+        listener = await asyncio.start_unix_server(server.handle_connection,
+                                                   socket_path)
+        print("Listening on Unix socket \"%s\"" % socket_path)
+    else:
+        listener = await asyncio.start_server(server.handle_connection,
+                                              "localhost", port)
+        print("Listening on http://localhost:%d/" % port)
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == "__main__":
+    options = {}
+    for arg in sys.argv[1:]:
+        name, _, value = arg[2:].partition("=")
+        if not arg.startswith("--") or name not in [
+                "port", "socket", "files", "workers", "no-cache"]:
+            print(__doc__)
+            sys.exit(1)
+        options[name] = value
+    try:
+        server = AnalysisServer(
+            options.get("files", analyze.score_file_pattern),
+            None if "no-cache" in options else "tmp/cache",
+            int(options.get("workers", 0)) or os.cpu_count())
+    except ValueError as e:
+        print("! %s" % e)
+        sys.exit(1)
+    try:
+        asyncio.run(serve(server, int(options.get("port", 8000)),
+                          options.get("socket")))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()